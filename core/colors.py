@@ -0,0 +1,93 @@
+"""
+In-process map of Color names to hex codes.
+
+Serializers resolve a variation's color for every variation they render,
+so the map lives in memory and lookups never touch the database. Saving or
+deleting a Color bumps a version number in the shared cache (see
+core/signals.py). Every worker compares its map against that version at
+most every CHECK_INTERVAL seconds, and reloads it from the cache, or from
+the primary database if no other worker has built it yet. A map older than
+MAX_AGE seconds is rebuilt from the database whatever the version says, so
+with a per-process cache, where other workers never see the bump, a change
+still reaches them within MAX_AGE.
+"""
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Color
+
+VERSION_KEY = 'core:color_hex:version'
+MAP_KEY = 'core:color_hex:{}'
+MAP_TIMEOUT = 24 * 60 * 60
+# Seconds between checks for changes made by other workers.
+CHECK_INTERVAL = 5
+# Seconds after which a map is rebuilt from the database regardless.
+MAX_AGE = 60
+
+
+class ColorHexMap:
+    def __init__(self, check_interval=CHECK_INTERVAL, max_age=MAX_AGE):
+        self.check_interval = check_interval
+        self.max_age = max_age
+        self._colors = None
+        self._version = None
+        self._checked_at = 0.0
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        """Hex code of the color called ``name`` (case-insensitive), or None."""
+        if not name:
+            return None
+        return self._current().get(str(name).lower())
+
+    def _current(self):
+        colors = self._colors
+        if colors is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return colors
+        with self._lock:
+            # A fresh starting point, so a version lost from the cache never
+            # matches one an old map was built for.
+            version = cache.get_or_set(VERSION_KEY, time.time_ns(), timeout=None)
+            expired = self._colors is not None and time.monotonic() - self._loaded_at >= self.max_age
+            if self._colors is None or version != self._version or expired:
+                self._colors = self._load(version, from_database=expired)
+                self._version = version
+                self._loaded_at = time.monotonic()
+            self._checked_at = time.monotonic()
+            return self._colors
+
+    def _load(self, version, from_database=False):
+        key = MAP_KEY.format(version)
+        colors = None if from_database else cache.get(key)
+        if colors is None:
+            colors = {}
+            # From the primary: a lagging replica would cache a stale map
+            # under the new version. The first match wins, like .first().
+            for name, hex_code in Color.objects.using('default').order_by('pk').values_list(
+                'name', 'hex_code'
+            ):
+                colors.setdefault(name.lower(), hex_code)
+            cache.set(key, colors, timeout=MAP_TIMEOUT)
+        return colors
+
+    def invalidate(self):
+        """Make every worker reload the map once the current transaction commits."""
+        transaction.on_commit(self._bump)
+
+    def _bump(self):
+        try:
+            cache.incr(VERSION_KEY)
+        except ValueError:
+            cache.set(VERSION_KEY, time.time_ns(), timeout=None)
+        self._colors = None
+
+
+color_hex_map = ColorHexMap()
+
+
+def color_hex(name):
+    return color_hex_map.get(name)
@@ -0,0 +1,87 @@
+"""
+Conditional GET (ETag / Last-Modified) for catalog viewsets.
+
+Validators are computed before anything is serialized, from one aggregate
+query over the rows a response is built from: how many there are and their
+newest ``updated_at``, including related rows such as a product's variations.
+Any save moves an ``updated_at`` and any insert or delete changes a count,
+so the ETag changes whenever the response would. A client that sends back
+a matching If-None-Match (or an If-Modified-Since no older than the data)
+gets 304 Not Modified with no body.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+
+class ConditionalGetMixin:
+    """
+    ETag and Last-Modified on ``list`` and ``retrieve``.
+
+    ``conditional_fields`` lists the timestamps the representation depends
+    on, as lookups from the queryset's model (``'category__updated_at'``).
+    Rows reached through a relation are counted as well. Data from outside
+    the queryset, such as colors, comes from ``get_conditional_state()``;
+    its ``modified_*`` values count towards Last-Modified too. It must be
+    read from the database, not a per-process cache, so every worker
+    sends the same ETag for the same response.
+    """
+    conditional_fields = ('updated_at',)
+
+    def get_conditional_fields(self):
+        return self.conditional_fields
+
+    def get_conditional_state(self):
+        """``{name: value}`` of anything else the representation depends on."""
+        return {}
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return self.conditional_response(queryset, super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            **{self.lookup_field: kwargs[lookup_url_kwarg]}
+        )
+        return self.conditional_response(queryset, super().retrieve, request, *args, **kwargs)
+
+    def get_validators(self, queryset, request):
+        """``(etag, last_modified)`` for ``queryset``; last_modified is a timestamp or None."""
+        aggregates = {'count': Count('pk', distinct=True)}
+        for i, field in enumerate(self.get_conditional_fields()):
+            aggregates[f'modified_{i}'] = Max(field)
+            relation = field.rpartition('__')[0]
+            if relation:
+                aggregates[f'count_{i}'] = Count(relation, distinct=True)
+        values = queryset.order_by().aggregate(**aggregates)
+
+        values.update(self.get_conditional_state())
+        state = '|'.join(f'{name}={values[name]}' for name in sorted(values))
+        digest = hashlib.md5(f'{state}|{request.accepted_renderer.format}'.encode()).hexdigest()
+        modified = [
+            value for name, value in values.items()
+            if name.startswith('modified_') and value is not None
+        ]
+        last_modified = int(max(modified).timestamp()) if modified else None
+        return quote_etag(digest), last_modified
+
+    def conditional_response(self, queryset, handler, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return handler(request, *args, **kwargs)
+
+        etag, last_modified = self.get_validators(queryset, request)
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+            # Revalidate every time rather than guessing a freshness lifetime.
+            patch_cache_control(response, no_cache=True)
+        return response
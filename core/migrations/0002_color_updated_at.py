@@ -0,0 +1,18 @@
+# Generated by Django 4.2.10 on 2026-10-17 15:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='color',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -3,6 +3,7 @@ from django.db import models
 class Color(models.Model):
     name = models.CharField(max_length=50)
     hex_code = models.CharField(max_length=7, help_text="HEX color code, e.g. #FFFFFF")
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
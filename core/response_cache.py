@@ -0,0 +1,126 @@
+"""
+Versioned cache of rendered catalog responses.
+
+Public catalog endpoints (products, categories, colors, sizes, delivery
+locations) render the same JSON for every visitor until an admin changes
+something. CachedResponseMixin stores the rendered body under a key built
+from the URL, its query parameters and a version number per resource the
+view depends on. Saving or deleting one of those models bumps the version
+once the transaction commits (see core/signals.py and products/signals.py),
+so the next request misses and rebuilds. Stale entries are never read again
+and age out of the store.
+
+Responses live in the ``responses`` cache. Any Django cache backend works:
+the default is per process; FileBasedCache or RedisCache share one store
+between workers.
+"""
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+CACHE_ALIAS = 'responses'
+VERSION_KEY = 'response_cache:version:{}'
+RESPONSE_KEY = 'response_cache:{}:{}'
+# Stored with the body; the validators let hits answer conditional requests.
+CACHED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Cache-Control')
+
+
+class ResponseCache:
+    def __init__(self, alias=CACHE_ALIAS):
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def versions(self, resources):
+        keys = [VERSION_KEY.format(resource) for resource in resources]
+        versions = self.cache.get_many(keys)
+        for key in keys:
+            if key not in versions:
+                # A fresh starting point, so a version lost from the store
+                # never matches one an old response was cached under.
+                self.cache.add(key, time.time_ns(), timeout=None)
+                versions[key] = self.cache.get(key)
+        return [versions[key] for key in keys]
+
+    def key(self, resources, request):
+        query = urlencode(sorted(request.query_params.lists()), doseq=True)
+        # Paginated bodies hold absolute links, so the host is part of the key.
+        url = f'{request.scheme}://{request.get_host()}{request.path}?{query}'
+        digest = hashlib.md5(
+            f'{url}|{request.accepted_renderer.format}'.encode()
+        ).hexdigest()
+        version = '.'.join(str(v) for v in self.versions(resources))
+        return RESPONSE_KEY.format(version, digest)
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, response):
+        headers = {name: response[name] for name in CACHED_HEADERS if name in response}
+        self.cache.set(key, (response.status_code, response.content, headers))
+
+    def invalidate(self, *resources):
+        """Make cached responses of ``resources`` stale once the current transaction commits."""
+        transaction.on_commit(lambda: self._bump(resources))
+
+    def _bump(self, resources):
+        for resource in resources:
+            key = VERSION_KEY.format(resource)
+            try:
+                self.cache.incr(key)
+            except ValueError:
+                self.cache.set(key, time.time_ns(), timeout=None)
+
+
+response_cache = ResponseCache()
+
+
+class CachedResponseMixin:
+    """
+    Serve ``list`` and ``retrieve`` of a viewset from the response cache.
+
+    ``cache_resources`` names the resources the responses are built from;
+    they are the same for every visitor. Only successful JSON responses are
+    cached; the browsable API is always rendered fresh. ``X-Cache`` tells
+    whether a response came from the cache. Hits keep the ETag and
+    Last-Modified of the original response and answer conditional requests
+    with them.
+    """
+    cache_resources = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if request.method != 'GET' or request.accepted_renderer.format != 'json':
+            return handler(request, *args, **kwargs)
+
+        key = response_cache.key(self.cache_resources, request)
+        cached = response_cache.get(key)
+        if cached is not None:
+            status, content, headers = cached
+            response = HttpResponse(content, status=status, headers=headers)
+            response['X-Cache'] = 'HIT'
+            return get_conditional_response(
+                request,
+                etag=headers.get('ETag'),
+                last_modified=parse_http_date_safe(headers.get('Last-Modified', '')),
+                response=response,
+            )
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            response.add_post_render_callback(lambda rendered: response_cache.set(key, rendered))
+        response['X-Cache'] = 'MISS'
+        return response
@@ -0,0 +1,39 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .colors import color_hex_map
+from .models import Color, DeliveryLocation, Size
+from .response_cache import response_cache
+
+
+@receiver(post_save, sender=Color)
+@receiver(post_delete, sender=Color)
+def invalidate_color_hex_map(sender, **kwargs):
+    if kwargs.get('raw'):
+        return
+    color_hex_map.invalidate()
+
+
+@receiver(post_save, sender=Color)
+@receiver(post_delete, sender=Color)
+def invalidate_color_responses(sender, **kwargs):
+    if kwargs.get('raw'):
+        return
+    # Variations carry their color's hex code.
+    response_cache.invalidate('colors', 'products')
+
+
+@receiver(post_save, sender=Size)
+@receiver(post_delete, sender=Size)
+def invalidate_size_responses(sender, **kwargs):
+    if kwargs.get('raw'):
+        return
+    response_cache.invalidate('sizes')
+
+
+@receiver(post_save, sender=DeliveryLocation)
+@receiver(post_delete, sender=DeliveryLocation)
+def invalidate_delivery_location_responses(sender, **kwargs):
+    if kwargs.get('raw'):
+        return
+    response_cache.invalidate('delivery_locations')
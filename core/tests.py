@@ -1,3 +1,181 @@
-from django.test import TestCase
+import threading
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+
+from ecommerce_project.turso_backend.base import is_read
+from ecommerce_project.turso_backend.pool import ConnectionPool, PoolTimeout
+from ecommerce_project.turso_backend.resilience import CircuitBreaker, RetryPolicy
+from ecommerce_project.turso_backend.sql import prepare
+
+from products import stock
+
+from .colors import ColorHexMap
+from .models import Color
+
+
+class ColorHexMapTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        Color.objects.create(name='Red', hex_code='#FF0000')
+
+    def test_map_expires_without_a_version_bump(self):
+        colors = ColorHexMap(check_interval=0, max_age=60)
+        self.assertEqual(colors.get('red'), '#FF0000')
+        # Saved by another worker: with a per-process cache this worker
+        # never sees the version change.
+        Color.objects.filter(name='Red').update(hex_code='#CC0000')
+        self.assertEqual(colors.get('red'), '#FF0000')
+
+        now = colors._loaded_at + 61
+        with mock.patch('core.colors.time.monotonic', return_value=now):
+            self.assertEqual(colors.get('red'), '#CC0000')
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def test_cancelled_trial_lets_the_next_call_through(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+
+        def cancelled():
+            raise KeyboardInterrupt
+
+        with self.assertRaises(KeyboardInterrupt):
+            RetryPolicy().call(cancelled, breaker, idempotent=True)
+        self.assertEqual(RetryPolicy().call(lambda: 'ok', breaker, idempotent=True), 'ok')
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+
+class HealthViewTests(SimpleTestCase):
+    def test_database_errors_are_not_disclosed(self):
+        with mock.patch('core.views.connection') as connection, self.assertLogs('core.views'):
+            connection.breaker = None
+            connection.cursor.side_effect = RuntimeError('libsql://secret-db.turso.io refused')
+            response = self.client.get('/api/v1/health/')
+        self.assertEqual(response.status_code, 503)
+        self.assertNotIn('secret', response.content.decode())
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.healthy = True
+        self.pings = 0
+
+    def ping(self):
+        self.pings += 1
+        if not self.healthy:
+            raise ConnectionError
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 1000.0
+        clock = mock.patch('ecommerce_project.turso_backend.pool.time.monotonic', side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+        self.opened = []
+
+    def pool(self, **options):
+        def factory():
+            conn = FakeConnection()
+            self.opened.append(conn)
+            return conn
+        options = {'max_size': 2, 'idle_timeout': 300, 'health_check_interval': 30, 'checkout_timeout': 0, **options}
+        return ConnectionPool(factory, **options)
+
+    def test_released_connections_are_reused_newest_first(self):
+        pool = self.pool()
+        a, b = pool.acquire(), pool.acquire()
+        pool.release(a)
+        pool.release(b)
+        self.assertIs(pool.acquire(), b)
+        self.assertIs(pool.acquire(), a)
+        self.assertEqual(len(self.opened), 2)
+
+    def test_idle_connections_are_evicted(self):
+        pool = self.pool()
+        conn = pool.acquire()
+        pool.release(conn)
+        self.now += 301
+        self.assertIsNot(pool.acquire(), conn)
+        self.assertTrue(conn.closed)
+        self.assertEqual(pool.size, 1)
+
+    def test_connections_are_pinged_after_sitting_idle(self):
+        pool = self.pool()
+        conn = pool.acquire()
+        pool.release(conn)
+        self.now += 10
+        self.assertIs(pool.acquire(), conn)
+        self.assertEqual(conn.pings, 0)
+        pool.release(conn)
+        self.now += 31
+        self.assertIs(pool.acquire(), conn)
+        self.assertEqual(conn.pings, 1)
+
+    def test_broken_connections_are_replaced(self):
+        pool = self.pool()
+        conn = pool.acquire()
+        pool.release(conn)
+        conn.healthy = False
+        self.now += 31
+        replacement = pool.acquire()
+        self.assertIsNot(replacement, conn)
+        self.assertTrue(conn.closed)
+        self.assertEqual(pool.size, 1)
+
+    def test_checkout_times_out_when_the_pool_is_full(self):
+        pool = self.pool(max_size=1)
+        pool.acquire()
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+
+    def test_connections_of_exited_threads_are_reclaimed(self):
+        pool = self.pool(max_size=1)
+        thread = threading.Thread(target=pool.acquire)
+        thread.start()
+        thread.join()
+        conn = pool.acquire()
+        self.assertTrue(self.opened[0].closed)
+        self.assertIs(conn, self.opened[1])
+
+
+class PrepareTests(SimpleTestCase):
+    def test_placeholders_become_libsql_ones(self):
+        self.assertEqual(
+            prepare("SELECT * FROM t WHERE a = %s AND b LIKE '50%%'", [1]),
+            ("SELECT * FROM t WHERE a = ? AND b LIKE '50%'", [1]),
+        )
+        self.assertEqual(
+            prepare("UPDATE t SET a = %(a)s", {'a': Decimal('1.50')}),
+            ("UPDATE t SET a = :a", {':a': '1.50'}),
+        )
+
+    def test_quoted_text_and_comments_are_left_alone(self):
+        sql, _ = prepare(
+            """SELECT '%s', "%s", [%s] -- %s\nFROM t /* %s */ WHERE 'it''s %s' = %s""", [1],
+        )
+        self.assertEqual(sql, """SELECT '%s', "%s", [%s] -- %s\nFROM t /* %s */ WHERE 'it''s %s' = ?""")
+
+    def test_statements_without_parameters_are_sent_verbatim(self):
+        self.assertEqual(prepare("SELECT '%%'", None), ("SELECT '%%'", []))
+
+
+class IsReadTests(SimpleTestCase):
+    def test_selects_are_reads(self):
+        self.assertTrue(is_read('  select 1'))
+        self.assertTrue(is_read('WITH t (a) AS (SELECT 1) SELECT a FROM t'))
+        self.assertTrue(is_read('WITH RECURSIVE t AS (SELECT 1 UNION ALL SELECT 1 FROM t) SELECT * FROM t'))
+        self.assertTrue(is_read(stock.SHORT_SQL.format(values='(1, 1, 1, 1, 1)')))
+
+    def test_writes_behind_a_with_clause_are_not(self):
+        self.assertFalse(is_read('WITH t AS (SELECT 1) INSERT INTO x SELECT * FROM t'))
+        self.assertFalse(is_read("WITH t AS (SELECT ')SELECT(') DELETE FROM x"))
+        self.assertFalse(is_read('UPDATE x SET a = (SELECT 1)'))
+        self.assertFalse(is_read(stock.HOLD_SQL.format(values='(1, 1, 1, 1, 1)')))
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ColorViewSet, SizeViewSet, DeliveryLocationViewSet, DashboardStatsView
+from .views import ColorViewSet, SizeViewSet, DeliveryLocationViewSet, DashboardStatsView, HealthView
 
 router = DefaultRouter()
 router.register(r'colors', ColorViewSet)
@@ -9,5 +9,6 @@ router.register(r'delivery-locations', DeliveryLocationViewSet)
 
 urlpatterns = [
     path('stats/', DashboardStatsView.as_view(), name='dashboard-stats'),
+    path('health/', HealthView.as_view(), name='health'),
     path('', include(router.urls)),
 ]
@@ -1,19 +1,25 @@
+import logging
+
 from rest_framework import viewsets
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
 from .models import Color, Size, DeliveryLocation
+from .response_cache import CachedResponseMixin
 from .serializers import ColorSerializer, SizeSerializer, DeliveryLocationSerializer
 
-class ColorViewSet(viewsets.ModelViewSet):
+class ColorViewSet(CachedResponseMixin, viewsets.ModelViewSet):
+    cache_resources = ('colors',)
     queryset = Color.objects.all()
     serializer_class = ColorSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
 
-class SizeViewSet(viewsets.ModelViewSet):
+class SizeViewSet(CachedResponseMixin, viewsets.ModelViewSet):
+    cache_resources = ('sizes',)
     queryset = Size.objects.all()
     serializer_class = SizeSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
 
-class DeliveryLocationViewSet(viewsets.ModelViewSet):
+class DeliveryLocationViewSet(CachedResponseMixin, viewsets.ModelViewSet):
+    cache_resources = ('delivery_locations',)
     queryset = DeliveryLocation.objects.all()
     serializer_class = DeliveryLocationSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
@@ -21,7 +27,9 @@ class DeliveryLocationViewSet(viewsets.ModelViewSet):
 
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import IsAdminUser
+from rest_framework.permissions import IsAdminUser, AllowAny
+from rest_framework import status
+from django.db import connection
 from django.db.models import Sum
 from products.models import Product, Category
 from orders.models import Order
@@ -55,3 +63,34 @@ class DashboardStatsView(APIView):
             'total_revenue': total_revenue,
             'total_customers': total_customers
         })
+
+
+logger = logging.getLogger(__name__)
+
+
+class HealthView(APIView):
+    """
+    Report database health for load balancers and uptime checks.
+    Returns 503 while the Turso circuit breaker is open or the database is unreachable.
+    """
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    def get(self, request):
+        breaker = getattr(connection, 'breaker', None)
+        database = breaker.as_dict() if breaker is not None else {}
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            database['reachable'] = True
+        except Exception:
+            # Details stay in the logs; the endpoint is public.
+            logger.warning("Health check query failed", exc_info=True)
+            database['reachable'] = False
+            database['error'] = 'Database unavailable.'
+
+        healthy = database['reachable']
+        return Response(
+            {'status': 'ok' if healthy else 'unavailable', 'database': database},
+            status=status.HTTP_200_OK if healthy else status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
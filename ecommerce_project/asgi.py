@@ -2,6 +2,9 @@
 ASGI config for ecommerce_project project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with uvicorn workers under gunicorn (see Procfile). Async views
+await Turso through ``turso_backend.aio``; sync views keep running on
+Django's thread pool.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
@@ -13,4 +16,21 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecommerce_project.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from ecommerce_project.turso_backend.aio import close_async_clients  # noqa: E402
+
+
+async def application(scope, receive, send):
+    # Django does not speak the lifespan protocol; handle it here so the
+    # event loop's Turso clients are closed cleanly on shutdown.
+    if scope['type'] != 'lifespan':
+        return await django_application(scope, receive, send)
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await close_async_clients()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
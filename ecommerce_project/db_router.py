@@ -0,0 +1,108 @@
+"""
+Route catalog reads to the read replica and everything else to the primary.
+
+Reads for the catalog apps (products, core) use the 'replica' alias when it
+is configured. Writes, reads for every other app, and reads inside an atomic
+block on the primary stay on 'default'. A client that has just written
+anything reads from the primary for REPLICA_PIN_SECONDS afterwards. This
+covers a checkout followed straight away by a reload of the product page,
+so the client is never shown stock the replica has not caught up with yet.
+"""
+import contextvars
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+REPLICA_ALIAS = 'replica'
+REPLICA_APPS = {'products', 'core'}
+PIN_COOKIE = 'db_pin'
+
+# Monotonic deadline until which the current request reads from the primary.
+_pinned_until = contextvars.ContextVar('pinned_until', default=0.0)
+# Whether the current request has written to the primary.
+_wrote = contextvars.ContextVar('wrote', default=False)
+
+
+def pin_to_primary(seconds=None):
+    """Send this context's reads to the primary for the next ``seconds``."""
+    if seconds is None:
+        seconds = settings.REPLICA_PIN_SECONDS
+    _pinned_until.set(max(_pinned_until.get(), time.monotonic() + seconds))
+
+
+def is_pinned():
+    return time.monotonic() < _pinned_until.get()
+
+
+def read_alias(app_label):
+    """The database alias reads for ``app_label`` should use right now."""
+    if REPLICA_ALIAS not in settings.DATABASES:
+        return 'default'
+    if app_label not in REPLICA_APPS:
+        return 'default'
+    if is_pinned() or connections['default'].in_atomic_block:
+        return 'default'
+    return REPLICA_ALIAS
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = read_alias(model._meta.app_label)
+        return None if alias == 'default' else alias
+
+    def db_for_write(self, model, **hints):
+        _wrote.set(True)
+        pin_to_primary()
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA_ALIAS
+
+
+class ReplicaPinningMiddleware:
+    """
+    Carry the read-your-writes pin across requests with a short-lived cookie.
+
+    Unsafe requests read from the primary for their whole duration, and a
+    request that wrote anything tells the client to keep doing so for
+    REPLICA_PIN_SECONDS. That holds even when the next request lands on
+    another worker.
+    """
+
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        self.start(request)
+        return self.finish(self.get_response(request))
+
+    async def __acall__(self, request):
+        self.start(request)
+        return self.finish(await self.get_response(request))
+
+    def start(self, request):
+        _pinned_until.set(0.0)
+        _wrote.set(False)
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') or PIN_COOKIE in request.COOKIES:
+            pin_to_primary()
+
+    def finish(self, response):
+        if _wrote.get() and REPLICA_ALIAS in settings.DATABASES:
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True, samesite='Lax',
+            )
+        return response
@@ -0,0 +1,98 @@
+import logging
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from ecommerce_project.turso_backend.instrumentation import start_collecting, stop_collecting
+
+logger = logging.getLogger('turso.requests')
+
+
+class QueryStatsMiddleware:
+    """
+    Report how many Turso statements a request ran and how long they took.
+
+    When DB_STATS_HEADERS is on, responses carry X-DB-Queries and X-DB-Time,
+    and the most expensive statement fingerprints of each request are
+    logged to 'turso.requests'. That shows which endpoints fan out into
+    dozens of round trips.
+    """
+
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.DB_STATS_HEADERS:
+            return self.get_response(request)
+
+        stats, token = start_collecting()
+        try:
+            response = self.get_response(request)
+        finally:
+            stop_collecting(token)
+        return self.report(request, response, stats)
+
+    async def __acall__(self, request):
+        if not settings.DB_STATS_HEADERS:
+            return await self.get_response(request)
+
+        stats, token = start_collecting()
+        try:
+            response = await self.get_response(request)
+        finally:
+            stop_collecting(token)
+        return self.report(request, response, stats)
+
+    def report(self, request, response, stats):
+        response['X-DB-Queries'] = str(stats.count)
+        response['X-DB-Time'] = f"{stats.duration * 1000:.1f}"
+        if stats.count:
+            logger.info(
+                "%s %s: %d queries, %.1f ms, %d rows, %d bytes; top: %s",
+                request.method, request.path, stats.count, stats.duration * 1000,
+                stats.rows, stats.bytes,
+                "; ".join(
+                    f"{count}x {total * 1000:.1f} ms {fp}"
+                    for fp, (count, total) in stats.top()
+                ),
+            )
+        return response
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise that also runs natively under ASGI.
+
+    WhiteNoiseMiddleware is sync-only, and Django would otherwise tie up a
+    thread for every async request that passes through it.
+    """
+
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
@@ -0,0 +1,172 @@
+"""
+Keyset (seek) pagination for the large list endpoints.
+
+Pages are ordered by the view's ordering plus the primary key as a tie
+breaker, ``(created_at, id)`` by default. A cursor holds the ordering values
+of the row it points at, and the next page is the first ``page_size`` rows
+after it:
+
+    WHERE created_at < %s OR (created_at = %s AND id < %s)
+    ORDER BY created_at DESC, id DESC LIMIT page_size + 1
+
+Unlike LIMIT/OFFSET, SQLite seeks straight to the cursor in the
+``(created_at, id)`` index, so page 1000 costs the same as page 1.
+"""
+import datetime
+import decimal
+import json
+import operator
+import uuid
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from functools import reduce
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.urls import replace_query_param
+
+
+def _encode_value(value):
+    # Full precision: DjangoJSONEncoder would cut datetimes to milliseconds.
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (decimal.Decimal, uuid.UUID)):
+        return str(value)
+    return value
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination on the full ordering key.
+
+    Query parameters:
+    - cursor: Opaque position returned in ``next`` / ``previous``
+    - page_size: Rows per page, up to API_MAX_PAGE_SIZE
+    """
+    ordering = ('-created_at',)
+    page_size = settings.API_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.API_MAX_PAGE_SIZE
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        pk = queryset.model._meta.pk.name
+        if ordering[-1].lstrip('-') in ('pk', pk):
+            return ordering
+        # The primary key makes every position unique.
+        direction = '-' if ordering[-1].startswith('-') else ''
+        return ordering + (direction + pk,)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse, position = self.cursor if self.cursor else (False, None)
+
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(o[1:] if o.startswith('-') else '-' + o for o in ordering)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._after(queryset, ordering, position))
+
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_more = len(results) > self.page_size
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        if self.page:
+            self.next_position = self._get_position_from_instance(self.page[-1], self.ordering)
+            self.previous_position = self._get_position_from_instance(self.page[0], self.ordering)
+        else:
+            # Past either end: step back from where the cursor pointed.
+            self.next_position = self.previous_position = position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def _after(self, queryset, ordering, position):
+        """
+        Rows strictly after ``position`` in ``ordering``, where SQLite sorts
+        NULLs first ascending and last descending.
+        """
+        terms = []
+        equal = Q()
+        for order, value in zip(ordering, position):
+            name = order.lstrip('-')
+            descending = order.startswith('-')
+            if value is None:
+                if not descending:
+                    terms.append(equal & Q(**{f'{name}__isnull': False}))
+                equal &= Q(**{f'{name}__isnull': True})
+                continue
+            after = Q(**{f'{name}__lt' if descending else f'{name}__gt': value})
+            if descending and self._is_nullable(queryset, name):
+                after |= Q(**{f'{name}__isnull': True})
+            terms.append(equal & after)
+            equal &= Q(**{name: value})
+        condition = reduce(operator.or_, terms, Q(pk__in=[]))
+
+        # A range on the leading column lets the index seek to the cursor.
+        name, value = ordering[0].lstrip('-'), position[0]
+        if value is not None and not self._is_nullable(queryset, name):
+            condition &= Q(**{f'{name}__lte' if ordering[0].startswith('-') else f'{name}__gte': value})
+        return condition
+
+    def _is_nullable(self, queryset, name):
+        if name in queryset.query.annotations:
+            return getattr(queryset.query.annotations[name].output_field, 'null', True)
+        if name == 'pk':
+            return False
+        try:
+            return queryset.model._meta.get_field(name).null
+        except FieldDoesNotExist:
+            return True
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor((False, self.next_position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor((True, self.previous_position))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            cursor = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+            reverse, ordering, position = bool(cursor['r']), cursor['o'], cursor['p']
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        # A cursor only makes sense in the ordering it was issued for.
+        if ordering != list(self.ordering) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return reverse, position
+
+    def encode_cursor(self, cursor):
+        reverse, position = cursor
+        data = {'r': int(reverse), 'o': self.ordering, 'p': position}
+        encoded = urlsafe_b64encode(json.dumps(data, separators=(',', ':')).encode()).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def _get_position_from_instance(self, instance, ordering):
+        return [
+            _encode_value(instance.pk if order.lstrip('-') == 'pk' else getattr(instance, order.lstrip('-')))
+            for order in ordering
+        ]
@@ -42,7 +42,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'ecommerce_project.middleware.QueryStatsMiddleware',
+    'ecommerce_project.db_router.ReplicaPinningMiddleware',
+    'ecommerce_project.middleware.StaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -89,6 +91,29 @@ if TURSO_DATABASE_URL:
             'NAME': TURSO_DATABASE_URL,
             'OPTIONS': {
                 'auth_token': TURSO_AUTH_TOKEN,
+                # Warm libsql clients are reused across requests (see turso_backend/pool.py)
+                'pool_size': int(os.getenv('TURSO_POOL_SIZE', '4')),
+                'pool_idle_timeout': int(os.getenv('TURSO_POOL_IDLE_TIMEOUT', '300')),
+                'pool_health_check_interval': int(os.getenv('TURSO_POOL_HEALTH_CHECK_INTERVAL', '30')),
+                # Parameter sets per libsql batch request in executemany()
+                'batch_size': int(os.getenv('TURSO_BATCH_SIZE', '200')),
+                # 'websocket' enables real transactions/savepoints; 'http' runs each statement
+                # on its own (see DatabaseFeatures.supports_transactions for what that leaves best effort)
+                'transport': os.getenv('TURSO_TRANSPORT', 'http'),
+                # Queue result-less writes inside atomic blocks and send them in one round trip
+                'pipeline': os.getenv('TURSO_PIPELINE', 'False') == 'True',
+                # Rows fetched per page by QuerySet.iterator()
+                'stream_page_size': int(os.getenv('TURSO_STREAM_PAGE_SIZE', '2000')),
+                # Serve reads from a local embedded replica (needs libsql-experimental)
+                'replica_path': os.getenv('TURSO_REPLICA_PATH'),
+                'replica_sync_interval': int(os.getenv('TURSO_REPLICA_SYNC_INTERVAL', '60')),
+                # Log statements slower than this many milliseconds
+                'slow_query_ms': int(os.getenv('TURSO_SLOW_QUERY_MS', '500')),
+                # Retry transient failures of reads; fail fast while Turso is down
+                'retry_attempts': int(os.getenv('TURSO_RETRY_ATTEMPTS', '3')),
+                'retry_deadline': float(os.getenv('TURSO_RETRY_DEADLINE', '2.0')),
+                'breaker_threshold': int(os.getenv('TURSO_BREAKER_THRESHOLD', '5')),
+                'breaker_reset_timeout': int(os.getenv('TURSO_BREAKER_RESET_TIMEOUT', '30')),
             },
         }
     }
@@ -100,6 +125,43 @@ else:
         }
     }
 
+# Optional read replica: catalog reads go to the 'replica' alias (see
+# ecommerce_project/db_router.py). It uses the same engine and options as
+# the primary, pointed at another database URL or file.
+DATABASE_REPLICA_URL = os.getenv('DATABASE_REPLICA_URL')
+
+if DATABASE_REPLICA_URL:
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': DATABASE_REPLICA_URL,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['ecommerce_project.db_router.PrimaryReplicaRouter']
+
+# Seconds a client keeps reading from the primary after it wrote something
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', '5'))
+
+# Add X-DB-Queries / X-DB-Time (ms) headers and log per-request query stats
+DB_STATS_HEADERS = os.getenv('DB_STATS_HEADERS', 'False') == 'True'
+
+# Cache for data shared between workers (e.g. the color name -> hex map).
+# The default is per process, and other workers see a color change only once
+# their map expires (core/colors.py MAX_AGE); use a shared backend such as
+# FileBasedCache or Redis so that changes reach every worker straight away.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    },
+    # Rendered public catalog responses (see core/response_cache.py)
+    'responses': {
+        'BACKEND': os.getenv('RESPONSE_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('RESPONSE_CACHE_LOCATION', 'responses'),
+        'TIMEOUT': int(os.getenv('RESPONSE_CACHE_TIMEOUT', '300')),
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -156,8 +218,30 @@ REST_FRAMEWORK = {
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    # Per client (user, or IP for anonymous requests); kept in the default cache
+    'DEFAULT_THROTTLE_RATES': {
+        'reservations': os.getenv('RESERVATION_THROTTLE_RATE', '20/hour'),
+    },
 }
 
+# Page size of the paginated lists (products, admin orders and variations),
+# and the largest ?page_size= a client may ask for
+API_PAGE_SIZE = int(os.getenv('API_PAGE_SIZE', '50'))
+API_MAX_PAGE_SIZE = int(os.getenv('API_MAX_PAGE_SIZE', '200'))
+
+# Idempotency-Key on order creation (see orders/idempotency.py): how long a
+# stored response is replayed, how long a duplicate waits for the request
+# still running, and after how long an unfinished claim is taken over
+IDEMPOTENCY_KEY_TTL = int(os.getenv('IDEMPOTENCY_KEY_TTL', '86400'))
+IDEMPOTENCY_WAIT_TIMEOUT = float(os.getenv('IDEMPOTENCY_WAIT_TIMEOUT', '10'))
+IDEMPOTENCY_LOCK_TIMEOUT = int(os.getenv('IDEMPOTENCY_LOCK_TIMEOUT', '60'))
+
+# Seconds a cart reservation holds stock (see products/stock.py)
+STOCK_HOLD_TTL = int(os.getenv('STOCK_HOLD_TTL', '900'))
+# Largest quantity one reservation may hold of a single item, and in total
+RESERVATION_MAX_LINE_QUANTITY = int(os.getenv('RESERVATION_MAX_LINE_QUANTITY', '10'))
+RESERVATION_MAX_QUANTITY = int(os.getenv('RESERVATION_MAX_QUANTITY', '50'))
+
 # JWT Configuration
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=1),
@@ -196,6 +280,9 @@ CORS_ALLOWED_ORIGIN_REGEXES = [
 
 CORS_ALLOW_CREDENTIALS = True
 
+# Let the dashboard read the query stats headers
+CORS_EXPOSE_HEADERS = ['X-DB-Queries', 'X-DB-Time']
+
 # API Documentation Configuration
 SPECTACULAR_SETTINGS = {
     'TITLE': 'Woma E-commerce API',
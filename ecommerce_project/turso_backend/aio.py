@@ -0,0 +1,132 @@
+"""
+Async access to Turso for views served under ASGI.
+
+The Django backend runs every statement on a worker thread through
+``create_client_sync``. Async views can instead await ``AsyncTursoClient``,
+which drives libsql_client's native async client on the server's own event
+loop. A single worker can then keep many catalog requests waiting on Turso
+at once without holding a thread for each of them.
+
+    client = get_async_client(read_alias('products'))
+    rows = await client.fetchall('SELECT ... WHERE slug = %s', [slug])
+
+Statements use Django's placeholder style and are instrumented, retried
+and guarded by the circuit breaker the same way as the sync backend's.
+"""
+import os
+import time
+import weakref
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+import asyncio
+import libsql_client
+
+from .base import is_read, resolve_url
+from .instrumentation import record
+from .resilience import RetryPolicy, get_breaker
+from .sql import prepare
+
+TURSO_ENGINE = 'ecommerce_project.turso_backend'
+SQLITE_ENGINE = 'django.db.backends.sqlite3'
+
+
+class AsyncTursoClient:
+    """Awaitable counterpart of TursoConnection for autocommit statements."""
+
+    def __init__(self, url, token=None, slow_query_ms=None, retry_attempts=3,
+                 retry_deadline=2.0, breaker_threshold=5, breaker_reset_timeout=30):
+        self.slow_query_ms = slow_query_ms
+        self.retry = RetryPolicy(max_attempts=retry_attempts, deadline=retry_deadline)
+        # Shared with the sync connections: both talk to the same primary.
+        self.breaker = get_breaker(
+            (url, token),
+            failure_threshold=breaker_threshold,
+            reset_timeout=breaker_reset_timeout,
+        )
+        # One aiohttp session per client; its connector multiplexes requests.
+        self.client = libsql_client.create_client(resolve_url(url), auth_token=token)
+
+    @property
+    def closed(self):
+        return self.client.closed
+
+    async def execute(self, sql, params=None):
+        """Run one statement and return its libsql ResultSet."""
+        sql, params = prepare(sql, params)
+        started = time.perf_counter()
+        rs = await self.retry.acall(
+            lambda: self.client.execute(sql, params), self.breaker, idempotent=is_read(sql),
+        )
+        record(sql, params, time.perf_counter() - started, rs.rows, self.slow_query_ms)
+        return rs
+
+    async def fetchall(self, sql, params=None):
+        return (await self.execute(sql, params)).rows
+
+    async def fetchone(self, sql, params=None):
+        rows = await self.fetchall(sql, params)
+        return rows[0] if rows else None
+
+    async def batch(self, stmts):
+        """Run ``[(sql, params), ...]`` atomically in one request."""
+        stmts = [prepare(sql, params) for sql, params in stmts]
+        started = time.perf_counter()
+        results = await self.retry.acall(
+            lambda: self.client.batch(stmts), self.breaker, idempotent=False,
+        )
+        duration = (time.perf_counter() - started) / len(stmts)
+        for (sql, params), rs in zip(stmts, results):
+            record(sql, params, duration, rs.rows, self.slow_query_ms)
+        return results
+
+    async def close(self):
+        await self.client.close()
+
+
+def client_options(alias):
+    """Constructor arguments for an AsyncTursoClient on database ``alias``."""
+    try:
+        settings_dict = settings.DATABASES[alias]
+    except KeyError:
+        raise ImproperlyConfigured(f"Database alias {alias!r} is not configured.")
+    engine = settings_dict['ENGINE']
+    if engine == SQLITE_ENGINE:
+        # Local development: libsql_client opens the same SQLite file.
+        return {'url': f"file:{os.path.abspath(settings_dict['NAME'])}"}
+    if engine != TURSO_ENGINE:
+        raise ImproperlyConfigured(
+            f"Async Turso access is not available for the {engine!r} engine."
+        )
+    options = settings_dict['OPTIONS']
+    return {
+        'url': settings_dict['NAME'],
+        'token': options.get('auth_token'),
+        'slow_query_ms': options.get('slow_query_ms'),
+        'retry_attempts': options.get('retry_attempts', 3),
+        'retry_deadline': options.get('retry_deadline', 2.0),
+        'breaker_threshold': options.get('breaker_threshold', 5),
+        'breaker_reset_timeout': options.get('breaker_reset_timeout', 30),
+    }
+
+
+# event loop -> {alias: client}; aiohttp sessions cannot cross event loops.
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client(alias='default'):
+    """Return the running event loop's client for database ``alias``."""
+    loop = asyncio.get_running_loop()
+    clients = _clients.setdefault(loop, {})
+    client = clients.get(alias)
+    if client is None or client.closed:
+        client = AsyncTursoClient(**client_options(alias))
+        clients[alias] = client
+    return client
+
+
+async def close_async_clients():
+    """Close the running event loop's clients, e.g. on ASGI lifespan shutdown."""
+    clients = _clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        await client.close()
@@ -1,9 +1,132 @@
+import re
+import time
+from collections.abc import Mapping
+from functools import lru_cache
+
 from django.db.backends.sqlite3.base import DatabaseWrapper as SQLiteDatabaseWrapper
+from django.utils.functional import cached_property
+import asyncio
 import libsql_client
 
+from .instrumentation import record
+from .pool import get_pool
+from .replica import get_replica
+from .resilience import RetryPolicy, get_breaker
+from .sql import QUOTES, prepare
+
+def _report_error(sql, params, e):
+    # Better error reporting
+    import sys
+    print(f"Turso Database Error:", file=sys.stderr)
+    print(f"  SQL: {sql}", file=sys.stderr)
+    print(f"  Params: {params}", file=sys.stderr)
+    print(f"  Error: {str(e)}", file=sys.stderr)
+
+    # Try to extract more detail if it's a libsql error
+    if hasattr(e, '__dict__'):
+        print(f"  Error details: {e.__dict__}", file=sys.stderr)
+
+
+# URL schemes whose libsql client keeps a stream open, so BEGIN ... COMMIT
+# can span several requests. Plain HTTP runs every request on its own.
+TRANSACTIONAL_SCHEMES = ('ws', 'wss', 'file')
+
+
+def resolve_url(url, transport='http'):
+    """Map the configured database URL onto the requested libsql transport."""
+    scheme, sep, rest = url.partition('://')
+    if transport == 'websocket':
+        # libsql:// already means WebSocket (wss) to libsql_client
+        scheme = {'libsql': 'wss', 'https': 'wss', 'http': 'ws'}.get(scheme, scheme)
+    elif scheme == 'libsql':
+        # Convert libsql:// to https:// to force HTTP protocol instead of WebSocket
+        # This avoids 505 WebSocket handshake errors
+        scheme = 'https'
+    return f"{scheme}{sep}{rest}"
+
+
+def supports_interactive_transactions(url):
+    return url.partition('://')[0] in TRANSACTIONAL_SCHEMES
+
+
+# Stand-in result for a statement that was queued instead of sent.
+DEFERRED_RESULT = libsql_client.ResultSet((), [], 1, None)
+
+
+# Inserts whose outcome depends on the rows already there: an upsert or
+# INSERT OR IGNORE may affect no row, and callers read rowcount to tell.
+_CONDITIONAL_INSERT = re.compile(r'^\s*INSERT\s+OR\b|\bON\s+CONFLICT\b', re.IGNORECASE)
+
+
+_STATEMENT_KEYWORD = re.compile(r'\b(SELECT|VALUES|INSERT|REPLACE|UPDATE|DELETE)\b', re.IGNORECASE)
+
+
+def is_read(sql):
+    head = sql.lstrip()[:6].upper()
+    if head == 'SELECT':
+        return True
+    return head[:4] == 'WITH' and _cte_statement(sql) in ('SELECT', 'VALUES')
+
+
+@lru_cache(maxsize=1024)
+def _cte_statement(sql):
+    """
+    The keyword of the statement following a ``WITH`` clause: ``SELECT``
+    for ``WITH ... SELECT`` but ``INSERT`` for ``WITH ... INSERT``.
+
+    Only text outside parentheses and quotes counts, so the CTE bodies and
+    any literals in them are skipped.
+    """
+    outer = []
+    depth = 0
+    i = 0
+    n = len(sql)
+    while i < n:
+        char = sql[i]
+        if char in QUOTES:
+            close = QUOTES[char]
+            end = i + 1
+            while end < n:
+                if sql[end] == close:
+                    if close != ']' and end + 1 < n and sql[end + 1] == close:
+                        end += 2
+                        continue
+                    break
+                end += 1
+            i = end + 1
+            outer.append(' ')
+            continue
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif depth == 0:
+            outer.append(char)
+        i += 1
+    match = _STATEMENT_KEYWORD.search(''.join(outer))
+    return match.group(1).upper() if match else None
+
+
+def is_deferrable(sql):
+    """
+    Whether Django ignores the result of ``sql``, so it can wait in the
+    pipeline until the next statement that does need one.
+
+    UPDATE and DELETE are not deferrable: Model.save() and QuerySet.update()
+    read their rowcount. Neither are conditional inserts (``ON CONFLICT``,
+    ``INSERT OR ...``), which a deferred result would report as successful.
+    """
+    head = sql.lstrip()[:9].upper()
+    if head.startswith('INSERT'):
+        return 'RETURNING' not in sql.upper() and not _CONDITIONAL_INSERT.search(sql)
+    return head.startswith(('SAVEPOINT', 'RELEASE'))
+
+
 class TursoCursor:
-    def __init__(self, client):
-        self.client = client
+    def __init__(self, connection, batch_size=200):
+        self.connection = connection
+        # Parameter sets sent per libsql batch request in executemany()
+        self.batch_size = batch_size
         self.arraysize = 1
         self.description = None
         self.rowcount = -1
@@ -12,51 +135,77 @@ class TursoCursor:
         self.lastrowid = None
 
     def execute(self, sql, params=None):
-        if params is None:
-            params = []
-        
-        # Django uses %s, libsql uses ? or :name
-        # We need to convert %s to ?
-        # This is a naive replacement, might break if %s is in string
-        # But for now it's better than nothing
-        sql = sql.replace('%s', '?')
-        
+        # Django uses %s / %(name)s, libsql uses ? / :name
+        sql, params = prepare(sql, params)
+
+        started = time.perf_counter()
         try:
-            rs = self.client.execute(sql, params)
-            self.rows = rs.rows
-            self.row_idx = 0
-            self.rowcount = len(self.rows)
-            self.lastrowid = rs.last_insert_rowid
-            
-            if rs.columns:
-                self.description = []
-                for col in rs.columns:
-                    # name, type_code, display_size, internal_size, precision, scale, null_ok
-                    self.description.append((col, None, None, None, None, None, None))
-            else:
-                self.description = None
-                
+            rs = self.connection.execute(sql, params)
         except Exception as e:
-            # Better error reporting
-            import sys
-            print(f"Turso Database Error:", file=sys.stderr)
-            print(f"  SQL: {sql}", file=sys.stderr)
-            print(f"  Params: {params}", file=sys.stderr)
-            print(f"  Error: {str(e)}", file=sys.stderr)
-            
-            # Try to extract more detail if it's a libsql error
-            if hasattr(e, '__dict__'):
-                print(f"  Error details: {e.__dict__}", file=sys.stderr)
-            
+            _report_error(sql, params, e)
             raise e
-            
+        record(sql, params, time.perf_counter() - started, rs.rows, self.connection.slow_query_ms)
+
+        self._set_result(rs)
         return self
 
     def executemany(self, sql, param_list):
+        """
+        Run ``sql`` once per parameter set, sending ``batch_size`` sets per
+        libsql batch request instead of one HTTP round trip each.
+
+        Each batch runs as a single transaction on the server, so a failing
+        parameter set rolls back the rest of its chunk.
+        """
+        rowcount = 0
+        rs = None
+        chunk = []
         for params in param_list:
-            self.execute(sql, params)
+            chunk.append(prepare(sql, params))
+            if len(chunk) >= self.batch_size:
+                rs = self._run_batch(chunk)
+                rowcount += sum(r.rows_affected for r in rs)
+                chunk = []
+        if chunk:
+            rs = self._run_batch(chunk)
+            rowcount += sum(r.rows_affected for r in rs)
+
+        if rs:
+            self._set_result(rs[-1])
+        self.rowcount = rowcount
         return self
 
+    def _run_batch(self, stmts):
+        started = time.perf_counter()
+        try:
+            results = self.connection.batch(stmts)
+        except Exception as e:
+            _report_error(stmts[0][0], [args for _, args in stmts], e)
+            raise e
+        record(
+            stmts[0][0], [args for _, args in stmts],
+            time.perf_counter() - started, [], self.connection.slow_query_ms,
+        )
+        return results
+
+    def _set_result(self, rs):
+        # Plain tuples, as DB-API requires: libsql Rows hash and compare by
+        # identity, which breaks values_list() results used in sets.
+        self.rows = [row.astuple() for row in rs.rows]
+        self.row_idx = 0
+        # Writes report affected rows; Model.save() relies on an UPDATE's
+        # rowcount to decide whether it still has to INSERT.
+        self.rowcount = len(self.rows) if rs.columns else rs.rows_affected
+        self.lastrowid = rs.last_insert_rowid
+
+        if rs.columns:
+            self.description = []
+            for col in rs.columns:
+                # name, type_code, display_size, internal_size, precision, scale, null_ok
+                self.description.append((col, None, None, None, None, None, None))
+        else:
+            self.description = None
+
     def fetchone(self):
         if self.row_idx < len(self.rows):
             row = self.rows[self.row_idx]
@@ -67,12 +216,9 @@ class TursoCursor:
     def fetchmany(self, size=None):
         if size is None:
             size = self.arraysize
-        res = []
-        for _ in range(size):
-            row = self.fetchone()
-            if row is None:
-                break
-            res.append(row)
+        # One slice of the row list rather than a fetchone() call per row
+        res = self.rows[self.row_idx:self.row_idx + size]
+        self.row_idx += len(res)
         return res
 
     def fetchall(self):
@@ -83,28 +229,254 @@ class TursoCursor:
     def close(self):
         pass
 
+
+# A single-table query that selects its "id" first and is ordered by it
+# alone, as QuerySet.iterator() sends for .order_by('pk'). Without a JOIN
+# every id appears once, so the id of the last row is a cursor.
+_KEYSET_QUERY = re.compile(
+    r'^\s*SELECT\s+"(\w+)"\."id"[\s,].*\sORDER BY\s+"\1"\."id"\s+(ASC|DESC)\s*$',
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+class TursoStreamingCursor(TursoCursor):
+    """
+    Cursor for QuerySet.iterator() and other chunked reads.
+
+    libsql has no server-side cursors, so a SELECT is fetched a page at a
+    time, with at most ``page_size`` rows held in memory. A query ordered
+    by its table's ``id`` alone is paged by key (``WHERE id > ?``), which
+    seeks straight to each page and sees every row that exists throughout.
+    Any other query is wrapped in ``LIMIT ? OFFSET ?``: each page rescans
+    the rows before it, and outside a transaction rows written between
+    pages can be skipped or repeated, like with any offset pagination.
+    """
+
+    def __init__(self, connection, batch_size=200, page_size=2000):
+        super().__init__(connection, batch_size=batch_size)
+        self.page_size = page_size
+        self._query = None
+
+    def execute(self, sql, params=None):
+        if not is_read(sql) or isinstance(params, Mapping):
+            self._query = None
+            return super().execute(sql, params)
+        self._query = (sql, list(params or []))
+        self._offset = 0
+        match = _KEYSET_QUERY.match(sql)
+        self._keyset = match is not None and ' JOIN ' not in sql.upper()
+        self._descending = self._keyset and match.group(2).upper() == 'DESC'
+        self._last_key = None
+        self._fetch_page()
+        return self
+
+    def _fetch_page(self):
+        sql, params = self._query
+        if self._keyset:
+            direction, compare = ('DESC', '<') if self._descending else ('ASC', '>')
+            where = ''
+            if self._last_key is not None:
+                where = f' WHERE "id" {compare} %s'
+                params = params + [self._last_key]
+            super().execute(
+                f'SELECT * FROM ({sql}){where} ORDER BY "id" {direction} LIMIT %s',
+                params + [self.page_size],
+            )
+            if self.rows:
+                self._last_key = self.rows[-1][0]
+        else:
+            super().execute(
+                f'SELECT * FROM ({sql}) LIMIT %s OFFSET %s',
+                params + [self.page_size, self._offset],
+            )
+        self._offset += len(self.rows)
+        if len(self.rows) < self.page_size:
+            # Short page: the result set is exhausted.
+            self._query = None
+
+    def _ensure_rows(self):
+        if self.row_idx >= len(self.rows) and self._query is not None:
+            self._fetch_page()
+
+    def fetchone(self):
+        self._ensure_rows()
+        return super().fetchone()
+
+    def fetchmany(self, size=None):
+        self._ensure_rows()
+        return super().fetchmany(size)
+
+    def fetchall(self):
+        res = super().fetchall()
+        while self._query is not None:
+            self._fetch_page()
+            res.extend(self.rows)
+            self.row_idx = len(self.rows)
+        return res
+
 class TursoConnection:
-    def __init__(self, url, token):
-        # Convert libsql:// to https:// to force HTTP protocol instead of WebSocket
-        # This avoids 505 WebSocket handshake errors
-        if url.startswith('libsql://'):
-            url = url.replace('libsql://', 'https://')
+    def __init__(self, url, token, batch_size=200, transport='http', pipeline=False,
+                 stream_page_size=2000, replica_path=None, replica_sync_interval=60,
+                 slow_query_ms=None, retry_attempts=3, retry_deadline=2.0,
+                 breaker_threshold=5, breaker_reset_timeout=30):
+        self.batch_size = batch_size
+        # Transient network failures: reads are retried, and every worker
+        # thread stops calling Turso while the shared breaker is open.
+        self.retry = RetryPolicy(max_attempts=retry_attempts, deadline=retry_deadline)
+        self.breaker = get_breaker(
+            (url, token),
+            failure_threshold=breaker_threshold,
+            reset_timeout=breaker_reset_timeout,
+        )
+        # Statements slower than this are logged to the 'turso.slow_query' logger
+        self.slow_query_ms = slow_query_ms
+        self.stream_page_size = stream_page_size
+        # Local embedded replica serving reads outside transactions, if configured
+        self.replica = None
+        if replica_path:
+            self.replica = get_replica(
+                replica_path,
+                sync_url=None if url.startswith('file:') else url,
+                auth_token=token,
+                sync_interval=replica_sync_interval,
+            )
+        url = resolve_url(url, transport)
+        self.supports_transactions = supports_interactive_transactions(url)
+        # Open interactive transaction (libsql TransactionSync), if any
+        self.transaction = None
+        # With pipelining on, statements whose results Django ignores are
+        # queued inside atomic blocks and sent along with the next statement
+        # that needs a result, or at commit.
+        self.pipeline = pipeline
+        self.deferring = False
+        self.pending = []
         
         # Use sync client which handles the loop
         self.client = libsql_client.create_client_sync(url, auth_token=token)
         self.client.__enter__()
         self.autocommit = True 
 
-    def cursor(self):
-        return TursoCursor(self.client)
+    @property
+    def in_transaction(self):
+        return self.transaction is not None or self.deferring
+
+    @property
+    def closed(self):
+        return self.client.closed
+
+    def ping(self):
+        self.client.execute('SELECT 1')
+
+    def cursor(self, streaming=False):
+        if streaming:
+            return TursoStreamingCursor(
+                self, batch_size=self.batch_size, page_size=self.stream_page_size,
+            )
+        return TursoCursor(self, batch_size=self.batch_size)
+
+    def execute(self, sql, params):
+        if self.deferring and is_deferrable(sql):
+            self.pending.append((sql, params))
+            return DEFERRED_RESULT
+        if self.pending:
+            return self.flush([(sql, params)])[-1]
+        read = is_read(sql)
+        if self.transaction is not None:
+            return self._send(lambda: self.transaction.execute(sql, params))
+        if read and self.replica is not None and not self.deferring:
+            return self.replica.execute(sql, params)
+        if not read:
+            self._wrote()
+        # Only a read on its own is safe to repeat after a lost response.
+        return self._send(lambda: self.client.execute(sql, params), idempotent=read)
+
+    def batch(self, stmts):
+        if self.deferring and is_deferrable(stmts[0][0]):
+            self.pending.extend(stmts)
+            return [DEFERRED_RESULT] * len(stmts)
+        if self.pending:
+            return self.flush(stmts)[-len(stmts):]
+        self._wrote()
+        if self.transaction is not None:
+            return self._pipeline_in_transaction(stmts)
+        return self._send(lambda: self.client.batch(stmts))
+
+    def _send(self, func, idempotent=False):
+        return self.retry.call(func, self.breaker, idempotent)
+
+    def _wrote(self):
+        # Make the replica catch up before it serves the next read, so a
+        # request always sees its own writes.
+        if self.replica is not None:
+            self.replica.mark_stale()
+
+    def flush(self, stmts=()):
+        """Send queued statements, plus ``stmts``, in one round trip."""
+        stmts = self.pending + list(stmts)
+        self.pending = []
+        if not stmts:
+            return []
+        self._wrote()
+        if self.transaction is not None:
+            return self._pipeline_in_transaction(stmts)
+        # Without an interactive transaction the libsql batch itself is the
+        # transaction: everything queued so far commits together.
+        return self._send(lambda: self.client.batch(stmts))
+
+    def _pipeline_in_transaction(self, stmts):
+        # TransactionSync waits for each statement in turn. Issue them all
+        # on the client's loop at once instead, so the stream carries them
+        # back to back and answers in a single round trip. This reaches into
+        # libsql_client's sync wrappers (_transaction, _executor), which is
+        # why requirements.txt pins its version.
+        transaction = self.transaction._transaction
+
+        async def run():
+            return await asyncio.gather(
+                *(transaction.execute(sql, params) for sql, params in stmts)
+            )
+
+        return self._send(lambda: self.client._executor.submit_coro(run()))
+
+    def begin(self):
+        # The BEGIN is pipelined with the first statement, so it costs no
+        # extra round trip.
+        if self.supports_transactions and self.transaction is None:
+            self.transaction = self.client.transaction()
+        self.deferring = self.pipeline
 
     def commit(self):
-        pass
+        try:
+            self.flush()
+        except Exception:
+            self.rollback()
+            raise
+        self.deferring = False
+        transaction, self.transaction = self.transaction, None
+        if transaction is not None:
+            self._wrote()
+            try:
+                self._send(transaction.commit)
+            finally:
+                transaction.close()
 
     def rollback(self):
-        pass
+        # Queued statements never reached the server; just drop them.
+        self.pending = []
+        self.deferring = False
+        transaction, self.transaction = self.transaction, None
+        if transaction is not None:
+            try:
+                transaction.rollback()
+            finally:
+                transaction.close()
 
     def close(self):
+        self.pending = []
+        self.deferring = False
+        if self.transaction is not None:
+            self.transaction.close()
+            self.transaction = None
         self.client.__exit__(None, None, None)
 
 from django.db.backends.sqlite3.operations import DatabaseOperations as SQLiteDatabaseOperations
@@ -114,24 +486,120 @@ class DatabaseOperations(SQLiteDatabaseOperations):
         return sql
 
 class DatabaseFeatures(SQLiteDatabaseWrapper.features_class):
-    uses_savepoints = False
-    supports_transactions = False
     autocommit_when_autocommit_is_off = True
 
+    @cached_property
+    def supports_transactions(self):
+        """
+        Only stream-based transports (WebSocket, local file) can hold a
+        transaction open between statements. Over ``http``, the default,
+        every statement commits on its own and ``atomic()`` rolls nothing
+        back. What stays safe there is what a single statement guarantees:
+
+        - Stock is never oversold: ``products.stock.take()`` and ``hold()``
+          check and write in one statement.
+        - An Idempotency-Key is claimed by one request only (one upsert).
+
+        What is only best effort, and can be left half done by a worker
+        dying mid-request:
+
+        - Order creation: stock taken before the order and its items are
+          saved is given back when saving fails, but not after a crash.
+        - Idempotency keys: a claim left behind blocks its key until
+          IDEMPOTENCY_LOCK_TIMEOUT.
+        - Bulk variation imports: each batch commits as it is written, so a
+          failure leaves the earlier batches imported.
+        - Cancelling an order returns stock item by item.
+        - Derived data (stock summaries, search documents, attribute index)
+          refreshed after a write.
+        """
+        options = self.connection.settings_dict['OPTIONS']
+        url = resolve_url(self.connection.settings_dict['NAME'], options.get('transport', 'http'))
+        return supports_interactive_transactions(url)
+
+    @property
+    def uses_savepoints(self):
+        return self.supports_transactions
+
 class DatabaseWrapper(SQLiteDatabaseWrapper):
     features_class = DatabaseFeatures
     ops_class = DatabaseOperations
 
     def get_new_connection(self, conn_params):
-        url = conn_params['database']
-        token = self.settings_dict['OPTIONS'].get('auth_token')
-        return TursoConnection(url, token)
+        return self.pool.acquire()
+
+    @property
+    def pool(self):
+        """Process-wide connection pool shared by every thread using this database."""
+        options = self.settings_dict['OPTIONS']
+        url = self.settings_dict['NAME']
+        token = options.get('auth_token')
+        connection_kwargs = {
+            'batch_size': options.get('batch_size', 200),
+            'transport': options.get('transport', 'http'),
+            'pipeline': options.get('pipeline', False),
+            'stream_page_size': options.get('stream_page_size', 2000),
+            'replica_path': options.get('replica_path'),
+            'replica_sync_interval': options.get('replica_sync_interval', 60),
+            'slow_query_ms': options.get('slow_query_ms'),
+            'retry_attempts': options.get('retry_attempts', 3),
+            'retry_deadline': options.get('retry_deadline', 2.0),
+            'breaker_threshold': options.get('breaker_threshold', 5),
+            'breaker_reset_timeout': options.get('breaker_reset_timeout', 30),
+        }
+        return get_pool(
+            (url, token, tuple(sorted(connection_kwargs.items()))),
+            lambda: TursoConnection(url, token, **connection_kwargs),
+            max_size=options.get('pool_size', 4),
+            idle_timeout=options.get('pool_idle_timeout', 300),
+            health_check_interval=options.get('pool_health_check_interval', 30),
+            checkout_timeout=options.get('pool_checkout_timeout', 10),
+        )
+
+    @property
+    def breaker(self):
+        """Circuit breaker shared by every connection to this database."""
+        options = self.settings_dict['OPTIONS']
+        return get_breaker(
+            (self.settings_dict['NAME'], options.get('auth_token')),
+            failure_threshold=options.get('breaker_threshold', 5),
+            reset_timeout=options.get('breaker_reset_timeout', 30),
+        )
+
+    def _close(self):
+        # Hand the warm client back to the pool instead of tearing it down.
+        if self.connection is not None:
+            if self.connection.in_transaction:
+                # Never give the next request a half-finished transaction.
+                try:
+                    self.connection.rollback()
+                except Exception:
+                    self.pool.discard(self.connection)
+                    return
+            with self.wrap_database_errors:
+                self.pool.release(self.connection)
+
+    def _savepoint_allowed(self):
+        # SQLite ignores uses_savepoints here; over HTTP a SAVEPOINT would
+        # only live for its own request.
+        return self.features.uses_savepoints and self.in_atomic_block
+
+    def _start_transaction_under_autocommit(self):
+        # Open a libsql interactive transaction instead of sending a bare
+        # BEGIN, which over HTTP would only apply to its own request.
+        self.connection.begin()
 
     def create_cursor(self, name=None):
-        return self.connection.cursor()
+        return self.connection.cursor(streaming=name is not None)
+
+    def chunked_cursor(self):
+        # Named like PostgreSQL's server-side cursors; any name selects the
+        # paging cursor.
+        return self._cursor(name='chunked')
 
     def _set_autocommit(self, autocommit):
         pass
 
     def validate_no_broken_transaction(self):
-        pass
+        if self.features.supports_transactions:
+            super().validate_no_broken_transaction()
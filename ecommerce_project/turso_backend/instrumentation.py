@@ -0,0 +1,100 @@
+import contextvars
+import logging
+import re
+from collections.abc import Mapping
+from functools import lru_cache
+
+slow_query_logger = logging.getLogger('turso.slow_query')
+
+# Collector for the statements of the current request, if one is active.
+_current = contextvars.ContextVar('turso_query_stats', default=None)
+
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|\?|:\w+")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+# Multi-row VALUES, once each row has been collapsed to (...) or (?)
+_VALUES_LIST = re.compile(r"(\((?:\.\.\.|\?)\))(?:\s*,\s*\((?:\.\.\.|\?)\))+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(sql):
+    """
+    Normalize SQL so statements that differ only in literal values, IN-list
+    length or multi-row VALUES count share one fingerprint.
+    """
+    sql = _LITERAL.sub('?', sql)
+    sql = _IN_LIST.sub('(...)', sql)
+    sql = _VALUES_LIST.sub(r'\1, ...', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+def payload_size(params, rows=()):
+    """Rough number of bytes sent and received for one statement."""
+    if isinstance(params, Mapping):
+        params = params.values()
+    size = sum(_value_size(value) for value in params or ())
+    for row in rows:
+        size += sum(_value_size(value) for value in row)
+    return size
+
+
+def _value_size(value):
+    if value is None:
+        return 0
+    if isinstance(value, (bytes, str)):
+        return len(value)
+    if isinstance(value, (list, tuple, Mapping)):
+        # One parameter set of an executemany() batch
+        return payload_size(value)
+    return 8
+
+
+class QueryStats:
+    """Per-request aggregate of Turso statements, grouped by fingerprint."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.rows = 0
+        self.bytes = 0
+        # fingerprint -> [count, total seconds]
+        self.by_fingerprint = {}
+
+    def add(self, sql, duration, rows, size):
+        self.count += 1
+        self.duration += duration
+        self.rows += rows
+        self.bytes += size
+        entry = self.by_fingerprint.setdefault(fingerprint(sql), [0, 0.0])
+        entry[0] += 1
+        entry[1] += duration
+
+    def top(self, limit=5):
+        """The ``limit`` fingerprints that took the most time in total."""
+        return sorted(self.by_fingerprint.items(), key=lambda item: -item[1][1])[:limit]
+
+
+def start_collecting():
+    """Begin collecting statement stats for the current context."""
+    stats = QueryStats()
+    return stats, _current.set(stats)
+
+
+def stop_collecting(token):
+    _current.reset(token)
+
+
+def record(sql, params, duration, rows, slow_query_ms=None):
+    """Account for one executed statement; cheap when nothing is listening."""
+    stats = _current.get()
+    slow = slow_query_ms is not None and duration * 1000 >= slow_query_ms
+    if stats is None and not slow:
+        return
+    size = payload_size(params, rows)
+    if stats is not None:
+        stats.add(sql, duration, len(rows), size)
+    if slow:
+        slow_query_logger.warning(
+            "Slow Turso query (%.1f ms, %d rows, %d bytes): %s",
+            duration * 1000, len(rows), size, fingerprint(sql),
+        )
@@ -0,0 +1,215 @@
+import atexit
+import collections
+import os
+import threading
+import time
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection became free within the checkout timeout."""
+
+
+class ConnectionPool:
+    """
+    Process-wide pool of warm TursoConnection objects.
+
+    Each libsql client owns an event loop thread and an HTTP session, so
+    building one per Django connection means a fresh TLS handshake per
+    request. The pool keeps up to ``max_size`` connections alive, hands the
+    most recently used one out first, drops connections that sat idle longer
+    than ``idle_timeout`` and pings connections that have not been used for
+    ``health_check_interval`` seconds before handing them out again. Pings
+    and closes happen outside the pool's lock, so a slow network never holds
+    up threads returning or checking out other connections.
+    """
+
+    def __init__(self, factory, max_size=4, idle_timeout=300,
+                 health_check_interval=30, checkout_timeout=10):
+        self.factory = factory
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.checkout_timeout = checkout_timeout
+
+        self._cond = threading.Condition()
+        # Idle connections as (connection, released_at); newest on the right.
+        self._idle = collections.deque()
+        # Checked-out connections mapped to the thread that owns them.
+        self._checked_out = {}
+        # Slots reserved by threads that are still opening a connection.
+        self._pending = 0
+        self._pid = os.getpid()
+
+    @property
+    def size(self):
+        return len(self._idle) + len(self._checked_out) + self._pending
+
+    def acquire(self):
+        """Check out a connection for the calling thread."""
+        deadline = time.monotonic() + self.checkout_timeout
+        while True:
+            conn, released_at = self._reserve(deadline)
+            if conn is None:
+                try:
+                    conn = self.factory()
+                except Exception:
+                    self._unreserve()
+                    raise
+            elif not self._is_healthy(conn, released_at):
+                self._close_quietly(conn)
+                self._unreserve()
+                continue
+            with self._cond:
+                self._pending -= 1
+                self._checked_out[conn] = threading.current_thread()
+            return conn
+
+    def _reserve(self, deadline):
+        """
+        Reserve a slot for the calling thread: ``(conn, released_at)`` for
+        an idle connection to check before use, or ``(None, None)`` when a
+        new one may be opened. The slot stays pending, so other threads do
+        not overshoot max_size while the caller pings or connects without
+        the lock. Connections dropped on the way are closed after the lock
+        is released.
+        """
+        stale = []
+        try:
+            with self._cond:
+                self._reset_after_fork()
+                while True:
+                    stale += self._prune_idle()
+                    if self._idle:
+                        self._pending += 1
+                        return self._idle.pop()
+
+                    if self.size >= self.max_size:
+                        stale += self._reclaim_orphans()
+                    if self.size < self.max_size:
+                        self._pending += 1
+                        return None, None
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeout(
+                            f"No Turso connection available after {self.checkout_timeout}s "
+                            f"(pool size {self.max_size})"
+                        )
+                    self._cond.wait(remaining)
+        finally:
+            for conn in stale:
+                self._close_quietly(conn)
+
+    def _unreserve(self):
+        with self._cond:
+            self._pending -= 1
+            self._cond.notify()
+
+    def release(self, conn):
+        """Return a connection to the pool, or close it if it is broken."""
+        with self._cond:
+            if os.getpid() != self._pid:
+                # Checked out before a fork: its loop thread is gone, so
+                # closing it would block forever. Just forget about it.
+                return
+            known = self._checked_out.pop(conn, None) is not None
+            if known and not conn.closed:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+        if not known:
+            self._close_quietly(conn)
+
+    def discard(self, conn):
+        """Close a checked-out connection instead of returning it."""
+        with self._cond:
+            self._checked_out.pop(conn, None)
+            self._cond.notify()
+        self._close_quietly(conn)
+
+    def close_all(self):
+        """Close every connection, including checked-out ones (interpreter shutdown)."""
+        with self._cond:
+            self._reset_after_fork()
+            conns = [conn for conn, _ in self._idle] + list(self._checked_out)
+            self._idle.clear()
+            self._checked_out.clear()
+            self._cond.notify_all()
+        for conn in conns:
+            self._close_quietly(conn)
+
+    def _is_healthy(self, conn, released_at):
+        if conn.closed:
+            return False
+        if time.monotonic() - released_at < self.health_check_interval:
+            return True
+        try:
+            conn.ping()
+        except Exception:
+            return False
+        return True
+
+    def _prune_idle(self):
+        """Drop connections idle past idle_timeout; returns them for closing."""
+        now = time.monotonic()
+        expired = []
+        # The oldest connections sit on the left of the deque.
+        while self._idle and now - self._idle[0][1] > self.idle_timeout:
+            expired.append(self._idle.popleft()[0])
+        return expired
+
+    def _reclaim_orphans(self):
+        """
+        Free slots held by threads that exited without closing their
+        connection; returns those connections for closing.
+        """
+        orphans = [conn for conn, owner in self._checked_out.items() if not owner.is_alive()]
+        for conn in orphans:
+            del self._checked_out[conn]
+        return orphans
+
+    def _reset_after_fork(self):
+        # gunicorn forks workers; the parent's event loop threads do not
+        # survive the fork, so start the child with an empty pool.
+        if os.getpid() != self._pid:
+            self._pid = os.getpid()
+            self._idle.clear()
+            self._checked_out.clear()
+            self._pending = 0
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(key, factory, **options):
+    """Return the process-wide pool for ``key``, creating it on first use."""
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(factory, **options)
+            _pools[key] = pool
+        return pool
+
+
+def close_all_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close_all()
+
+
+# Every libsql client runs a non-daemon event loop thread, and the
+# interpreter joins those threads *before* running atexit handlers, so idle
+# pooled clients have to be closed from the earlier threading hook or the
+# process never exits.
+if hasattr(threading, '_register_atexit'):
+    threading._register_atexit(close_all_pools)
+else:
+    atexit.register(close_all_pools)
@@ -0,0 +1,103 @@
+import os
+import threading
+import time
+from collections.abc import Mapping
+
+from django.core.exceptions import ImproperlyConfigured
+import libsql_client
+
+try:
+    import libsql_experimental
+except ImportError:
+    libsql_experimental = None
+
+
+class EmbeddedReplica:
+    """
+    Local SQLite copy of the Turso primary, used to serve reads.
+
+    Built on libsql's embedded replicas: ``sync()`` pulls new frames from the
+    primary into ``path``. The replica syncs when it is older than
+    ``sync_interval`` seconds and after any write made through this process
+    (``mark_stale``), so a request always reads its own writes. Without a
+    ``sync_url`` the file is opened as a plain local database, which is handy
+    as a stand-in during development and tests.
+    """
+
+    def __init__(self, path, sync_url=None, auth_token=None, sync_interval=60):
+        if libsql_experimental is None:
+            raise ImproperlyConfigured(
+                "The Turso embedded replica requires the 'libsql-experimental' package."
+            )
+        self.path = path
+        self.sync_interval = sync_interval
+        self.syncs = sync_url is not None
+        self._connect_kwargs = {}
+        if self.syncs:
+            self._connect_kwargs.update(sync_url=sync_url, auth_token=auth_token or '')
+        # libsql connections are not safe to share between threads, so each
+        # thread reads through its own; they all see the same local file.
+        self._local = threading.local()
+        self._sync_lock = threading.Lock()
+        self._synced_at = None
+        # Writes seen (mark_stale) and the count the last sync started from:
+        # a write during a sync leaves the replica stale.
+        self._writes = 0
+        self._synced_writes = -1
+
+    @property
+    def conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = libsql_experimental.connect(self.path, **self._connect_kwargs)
+        return conn
+
+    def mark_stale(self):
+        self._writes += 1
+
+    def is_stale(self):
+        return (
+            self._synced_writes != self._writes
+            or time.monotonic() - self._synced_at > self.sync_interval
+        )
+
+    def sync(self):
+        writes = self._writes
+        if self.syncs:
+            self.conn.sync()
+        self._synced_at = time.monotonic()
+        self._synced_writes = writes
+
+    def execute(self, sql, params):
+        if isinstance(params, Mapping):
+            # sqlite-style named parameters are bound without their prefix
+            params = {name.lstrip(':'): value for name, value in params.items()}
+        else:
+            params = tuple(params)
+        if self.is_stale():
+            # One thread syncs the shared file; the others wait for it
+            # rather than pull the same frames again.
+            with self._sync_lock:
+                if self.is_stale():
+                    self.sync()
+        cursor = self.conn.execute(sql, params)
+        columns = tuple(col[0] for col in cursor.description or ())
+        values = cursor.fetchall()
+        column_idxs = {column: idx for idx, column in enumerate(columns)}
+        rows = [libsql_client.Row(column_idxs, tuple(row)) for row in values]
+        return libsql_client.ResultSet(columns, rows, 0, None)
+
+
+_replicas = {}
+_replicas_lock = threading.Lock()
+
+
+def get_replica(path, **options):
+    """Return this process's replica for ``path``; one per worker after a fork."""
+    key = (os.getpid(), path)
+    with _replicas_lock:
+        replica = _replicas.get(key)
+        if replica is None:
+            replica = EmbeddedReplica(path, **options)
+            _replicas[key] = replica
+        return replica
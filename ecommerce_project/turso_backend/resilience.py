@@ -0,0 +1,188 @@
+import asyncio
+import random
+import re
+import threading
+import time
+
+import aiohttp
+from django.db.utils import OperationalError
+from libsql_client import LibsqlError
+
+# libsql codes that mean the transport failed rather than the statement.
+TRANSIENT_CODES = {'HRANA_WEBSOCKET_ERROR', 'STREAM_CLOSED'}
+_HTTP_STATUS = re.compile(r'HTTP status (\d{3})')
+
+
+class CircuitOpenError(OperationalError):
+    """Raised without touching the network while the circuit is open."""
+
+
+def is_transient(exc):
+    """Whether ``exc`` is a network/server blip worth retrying, not an SQL error."""
+    if isinstance(exc, (aiohttp.ClientError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    if isinstance(exc, LibsqlError):
+        if exc.code in TRANSIENT_CODES:
+            return True
+        if exc.code == 'SERVER_ERROR':
+            match = _HTTP_STATUS.search(exc.explanation)
+            # 5xx and rate limiting; 4xx such as a bad token will not heal
+            return match is None or int(match.group(1)) >= 500 or match.group(1) == '429'
+    return False
+
+
+class CircuitBreaker:
+    """
+    Fail fast while the primary is unhealthy.
+
+    After ``failure_threshold`` consecutive transient failures the circuit
+    opens, and every call fails immediately for ``reset_timeout`` seconds.
+    After that a single trial call is let through (half-open): success
+    closes the circuit, and failure opens it again.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def before_call(self):
+        """
+        Admit a call or raise CircuitOpenError. Returns whether the call is
+        the half-open trial, which the caller must end with ``end_trial()``
+        however it finishes.
+        """
+        with self._lock:
+            state = self.state
+            if state == self.CLOSED:
+                return False
+            if state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+        raise CircuitOpenError(
+            f"Turso circuit open after {self.failures} consecutive failures; "
+            f"retrying in {self.reset_timeout}s"
+        )
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+    def end_trial(self):
+        # A trial cancelled before it recorded a result must not keep every
+        # later call out.
+        with self._lock:
+            self._trial_in_flight = False
+
+    def as_dict(self):
+        return {'state': self.state, 'consecutive_failures': self.failures}
+
+
+class RetryPolicy:
+    """Jittered exponential backoff bounded by a total deadline."""
+
+    def __init__(self, max_attempts=3, base_delay=0.05, max_delay=1.0, deadline=2.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+
+    def delay(self, attempt):
+        # "Full jitter": spread retries from many workers over the window
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(self, func, breaker, idempotent):
+        """
+        Run ``func`` through ``breaker``, retrying transient failures when
+        ``idempotent`` (reads outside a transaction) allows it.
+        """
+        give_up_at = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            trial = breaker.before_call()
+            try:
+                result = func()
+            except Exception as e:
+                if not is_transient(e):
+                    # The server answered; it is healthy even if the SQL failed.
+                    breaker.record_success()
+                    raise
+                breaker.record_failure()
+                attempt += 1
+                if not idempotent or attempt >= self.max_attempts:
+                    raise
+                pause = self.delay(attempt)
+                if time.monotonic() + pause > give_up_at:
+                    raise
+            else:
+                breaker.record_success()
+                return result
+            finally:
+                if trial:
+                    breaker.end_trial()
+            time.sleep(pause)
+
+    async def acall(self, func, breaker, idempotent):
+        """Like ``call()``, for a ``func`` returning an awaitable."""
+        give_up_at = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            trial = breaker.before_call()
+            try:
+                result = await func()
+            except Exception as e:
+                if not is_transient(e):
+                    breaker.record_success()
+                    raise
+                breaker.record_failure()
+                attempt += 1
+                if not idempotent or attempt >= self.max_attempts:
+                    raise
+                pause = self.delay(attempt)
+                if time.monotonic() + pause > give_up_at:
+                    raise
+            else:
+                breaker.record_success()
+                return result
+            finally:
+                if trial:
+                    breaker.end_trial()
+            await asyncio.sleep(pause)
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(key, **options):
+    """Return the process-wide circuit breaker for ``key``."""
+    with _breakers_lock:
+        breaker = _breakers.get(key)
+        if breaker is None:
+            breaker = CircuitBreaker(**options)
+            _breakers[key] = breaker
+        return breaker
@@ -0,0 +1,95 @@
+from collections.abc import Mapping
+from decimal import Decimal
+from functools import lru_cache
+
+
+# Quote characters that open a literal or quoted identifier, mapped to the
+# character that closes it. SQLite escapes a closing quote by doubling it.
+QUOTES = {"'": "'", '"': '"', '`': '`', '[': ']'}
+
+
+@lru_cache(maxsize=1024)
+def translate_placeholders(sql, named=False):
+    """
+    Convert Django's "format"/"pyformat" placeholders to libsql's.
+
+    ``%s`` becomes ``?``, ``%(name)s`` becomes ``:name`` and ``%%`` becomes
+    ``%``. Placeholders inside string literals, quoted identifiers and
+    comments are left alone. Django sends the same few hundred statements
+    over and over, so results are cached by SQL text.
+    """
+    out = []
+    i = 0
+    n = len(sql)
+    while i < n:
+        char = sql[i]
+
+        if char in QUOTES:
+            close = QUOTES[char]
+            end = i + 1
+            while end < n:
+                if sql[end] == close:
+                    if close != ']' and end + 1 < n and sql[end + 1] == close:
+                        end += 2
+                        continue
+                    break
+                end += 1
+            # '%%' is still an escaped percent inside literals.
+            out.append(sql[i:end + 1].replace('%%', '%'))
+            i = end + 1
+
+        elif sql.startswith('--', i):
+            end = sql.find('\n', i)
+            end = n if end == -1 else end
+            out.append(sql[i:end])
+            i = end
+
+        elif sql.startswith('/*', i):
+            end = sql.find('*/', i + 2)
+            end = n if end == -1 else end + 2
+            out.append(sql[i:end])
+            i = end
+
+        elif char == '%' and i + 1 < n:
+            following = sql[i + 1]
+            if following == 's' and not named:
+                out.append('?')
+                i += 2
+            elif following == '%':
+                out.append('%')
+                i += 2
+            elif following == '(' and named:
+                close = sql.find(')s', i + 2)
+                if close == -1:
+                    raise ValueError(f"Unterminated named placeholder in SQL: {sql!r}")
+                out.append(':' + sql[i + 2:close])
+                i = close + 2
+            else:
+                out.append(char)
+                i += 1
+
+        else:
+            out.append(char)
+            i += 1
+
+    return ''.join(out)
+
+
+def adapt(value):
+    # Django's SQLite backend registers the same adapter with sqlite3;
+    # libsql only accepts None, int, float, str and bytes.
+    return str(value) if isinstance(value, Decimal) else value
+
+
+def prepare(sql, params):
+    """Return ``(sql, args)`` ready for libsql, translating placeholders."""
+    if params is None:
+        # Like Django's SQLite backend, statements without parameters are
+        # sent verbatim (schema SQL can contain literal '%' characters).
+        return sql, []
+    if isinstance(params, Mapping):
+        return (
+            translate_placeholders(sql, named=True),
+            {f':{name}': adapt(value) for name, value in params.items()},
+        )
+    return translate_placeholders(sql), [adapt(value) for value in params]
@@ -0,0 +1,80 @@
+"""
+Streaming export of orders, one row per order item, in CSV or NDJSON.
+
+    order_id, created_at, status, customer_email, customer_name, customer_phone,
+    shipping_address, total_amount, product_id, product_name, variation_id, sku,
+    variation_name, quantity, price_at_purchase, subtotal
+
+Orders are read oldest first, EXPORT_BATCH_SIZE at a time, by keyset on
+their ``(created_at, id)`` index, and the items of each batch come from a
+single prefetch query. A batch costs two queries wherever it is in the
+table, and only one batch is held in memory, so a year of orders streams as
+steadily as a day. An order without items is a row with empty item columns.
+"""
+from django.db.models import Prefetch, Q
+
+from .models import Order, OrderItem
+
+ORDER_COLUMNS = (
+    'order_id', 'created_at', 'status', 'customer_email', 'customer_name', 'customer_phone',
+    'shipping_address', 'total_amount',
+)
+ITEM_COLUMNS = (
+    'product_id', 'product_name', 'variation_id', 'sku', 'variation_name', 'quantity',
+    'price_at_purchase', 'subtotal',
+)
+COLUMNS = ORDER_COLUMNS + ITEM_COLUMNS
+EXPORT_BATCH_SIZE = 500
+
+
+def _batches(queryset, size=EXPORT_BATCH_SIZE):
+    queryset = queryset.select_related('customer').prefetch_related(
+        Prefetch('items', queryset=OrderItem.objects.select_related('product', 'variation'))
+    ).order_by('created_at', 'id')
+    last = None
+    while True:
+        batch = queryset
+        if last is not None:
+            batch = batch.filter(
+                Q(created_at__gt=last.created_at) | Q(created_at=last.created_at, id__gt=last.id)
+            )
+        orders = list(batch[:size])
+        if not orders:
+            return
+        yield orders
+        last = orders[-1]
+
+
+def export_rows(queryset=None):
+    """Export rows for ``queryset`` (all orders by default), oldest first."""
+    if queryset is None:
+        queryset = Order.objects.all()
+    for orders in _batches(queryset):
+        for order in orders:
+            header = {
+                'order_id': str(order.id),
+                'created_at': order.created_at.isoformat(),
+                'status': order.status,
+                'customer_email': order.customer.email if order.customer else order.customer_email,
+                'customer_name': order.customer_name,
+                'customer_phone': order.customer_phone,
+                'shipping_address': order.shipping_address,
+                'total_amount': str(order.total_amount),
+            }
+            items = order.items.all()
+            if not items:
+                yield dict(header, **dict.fromkeys(ITEM_COLUMNS))
+            for item in items:
+                variation = item.variation
+                yield dict(
+                    header,
+                    product_id=str(item.product_id),
+                    product_name=item.product.name,
+                    variation_id=str(variation.id) if variation else None,
+                    sku=variation.sku if variation else None,
+                    variation_name=variation.name if variation else None,
+                    quantity=item.quantity,
+                    price_at_purchase=str(item.price_at_purchase),
+                    subtotal=str(item.subtotal),
+                )
+
@@ -0,0 +1,16 @@
+import django_filters
+
+from .models import Order
+
+
+class OrderFilter(django_filters.FilterSet):
+    """
+    ``?created_at_after=`` / ``?created_at_before=`` (dates, both inclusive)
+    and ``?status=`` (repeatable) for the admin order list and export.
+    """
+    created_at = django_filters.DateFromToRangeFilter()
+    status = django_filters.MultipleChoiceFilter(choices=Order.STATUS_CHOICES)
+
+    class Meta:
+        model = Order
+        fields = ['created_at', 'status']
@@ -0,0 +1,151 @@
+"""
+Idempotency keys for order placement.
+
+Clients that retry after a timeout send the same ``Idempotency-Key`` header
+with every attempt. The first request claims the key in ``idempotency_keys``
+with a single upsert, places the order and stores its response for
+IDEMPOTENCY_KEY_TTL seconds. Later requests with the key get that response
+back, marked ``Idempotent-Replayed: true``, without placing the order again.
+A duplicate that arrives while the first request is still running polls
+until it finishes, and gives up with 409 after IDEMPOTENCY_WAIT_TIMEOUT
+seconds.
+
+Keys are scoped to the signed-in user; anonymous clients share one scope.
+Reusing a key for a different request body is rejected with 422. Only
+successful responses are kept: when placing the order fails, the key is
+released so the client can retry with it. A claim left behind by a worker
+that died is taken over after IDEMPOTENCY_LOCK_TIMEOUT seconds, and
+``manage.py purge_idempotency_keys`` deletes expired keys.
+"""
+import functools
+import hashlib
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, router
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+# Seconds between looks at a key another request is still working on.
+POLL_INTERVAL = 0.05
+MAX_POLL_INTERVAL = 0.5
+
+_TABLE = IdempotencyKey._meta.db_table
+
+# Inserts a new claim, or takes over an expired one. Affects no row while
+# the key is held by a live request or a stored response.
+CLAIM_SQL = f"""
+    INSERT INTO {_TABLE} ("key", fingerprint, created_at, expires_at)
+    VALUES (%s, %s, %s, %s)
+    ON CONFLICT ("key") DO UPDATE SET
+        fingerprint = excluded.fingerprint,
+        status_code = NULL,
+        response_body = NULL,
+        created_at = excluded.created_at,
+        expires_at = excluded.expires_at
+    WHERE {_TABLE}.expires_at <= excluded.created_at
+"""
+
+
+def _alias():
+    return router.db_for_write(IdempotencyKey)
+
+
+def claim(key, fingerprint):
+    """Claim ``key`` for a new request. Returns whether it was free."""
+    connection = connections[_alias()]
+    field = IdempotencyKey._meta.get_field('expires_at')
+    now = timezone.now()
+    lease = now + timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT)
+    with connection.cursor() as cursor:
+        cursor.execute(CLAIM_SQL, [
+            key, fingerprint,
+            field.get_db_prep_value(now, connection),
+            field.get_db_prep_value(lease, connection),
+        ])
+        return cursor.rowcount == 1
+
+
+def complete(key, response):
+    """Store ``response`` as the outcome of ``key``."""
+    IdempotencyKey.objects.using(_alias()).filter(key=key).update(
+        status_code=response.status_code,
+        # Through DRF's encoder, so a replay renders exactly like the original.
+        response_body=json.loads(json.dumps(response.data, cls=JSONEncoder)),
+        expires_at=timezone.now() + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL),
+    )
+
+
+def release(key):
+    """Give up an unfinished claim on ``key``."""
+    IdempotencyKey.objects.using(_alias()).filter(key=key, status_code__isnull=True).delete()
+
+
+def fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, cls=JSONEncoder)
+    return hashlib.md5(f'{request.method}|{request.path}|{body}'.encode()).hexdigest()
+
+
+def idempotent(create):
+    """Honour an ``Idempotency-Key`` header on a viewset's ``create``."""
+
+    @functools.wraps(create)
+    def wrapper(self, request, *args, **kwargs):
+        header = request.headers.get(HEADER)
+        if not header:
+            return create(self, request, *args, **kwargs)
+        if len(header) > MAX_KEY_LENGTH:
+            return Response(
+                {'detail': f'{HEADER} must be at most {MAX_KEY_LENGTH} characters.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        scope = request.user.pk if request.user.is_authenticated else 'anonymous'
+        key = f'{scope}:{header}'
+        digest = fingerprint(request)
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_TIMEOUT
+        delay = POLL_INTERVAL
+        while not claim(key, digest):
+            record = IdempotencyKey.objects.using(_alias()).filter(key=key).first()
+            if record is None:
+                # Released by a failed first attempt; claim it again.
+                continue
+            if record.fingerprint != digest:
+                return Response(
+                    {'detail': f'{HEADER} was already used for a different request.'},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                )
+            if record.status_code is not None:
+                return Response(
+                    record.response_body, status=record.status_code,
+                    headers={'Idempotent-Replayed': 'true'},
+                )
+            if time.monotonic() >= deadline:
+                return Response(
+                    {'detail': f'A request with this {HEADER} is still being processed.'},
+                    status=status.HTTP_409_CONFLICT,
+                    headers={'Retry-After': '1'},
+                )
+            time.sleep(delay)
+            delay = min(delay * 2, MAX_POLL_INTERVAL)
+
+        try:
+            response = create(self, request, *args, **kwargs)
+        except BaseException:
+            release(key)
+            raise
+        if status.is_success(response.status_code):
+            complete(key, response)
+        else:
+            release(key)
+        return response
+
+    return wrapper
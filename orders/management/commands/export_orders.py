@@ -0,0 +1,49 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ecommerce_project import streaming
+from orders import export
+from orders.filters import OrderFilter
+from orders.models import Order
+
+
+class Command(BaseCommand):
+    help = "Export orders, one row per item, oldest first."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', '-o',
+            help="File to write; standard output by default.",
+        )
+        parser.add_argument(
+            '--format', choices=streaming.FORMATS, dest='file_format',
+            help="File format; guessed from --output, csv by default.",
+        )
+        parser.add_argument('--since', metavar='YYYY-MM-DD', help="Only orders placed on or after this day.")
+        parser.add_argument('--until', metavar='YYYY-MM-DD', help="Only orders placed on or before this day.")
+        parser.add_argument(
+            '--status', action='append', dest='statuses', metavar='STATUS',
+            help="Only orders with this status (can be given more than once).",
+        )
+
+    def handle(self, *args, **options):
+        filterset = OrderFilter({
+            'created_at_after': options['since'] or '',
+            'created_at_before': options['until'] or '',
+            'status': options['statuses'] or [],
+        }, queryset=Order.objects.all())
+        if not filterset.is_valid():
+            raise CommandError('; '.join(
+                f"{field}: {' '.join(errors)}" for field, errors in filterset.errors.items()
+            ))
+
+        path = options['output']
+        file_format = options['file_format'] or streaming.format_for(path) or streaming.CSV
+        stream = open(path, 'w', encoding='utf-8', newline='') if path else sys.stdout
+        try:
+            for part in streaming.format_rows(export.export_rows(filterset.qs), file_format, export.COLUMNS):
+                stream.write(part)
+        finally:
+            if path:
+                stream.close()
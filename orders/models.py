@@ -1,9 +1,29 @@
 import uuid
 from django.db import models
 from django.conf import settings
+from django.db.models.functions import Coalesce
 from products.models import Product
 
 
+class OrderQuerySet(models.QuerySet):
+    def for_list(self):
+        """Orders with their customer and an ``item_count`` annotation."""
+        items = OrderItem.objects.filter(order=models.OuterRef('pk')).order_by().values('order')
+        return self.select_related('customer').annotate(
+            item_count=Coalesce(
+                models.Subquery(items.annotate(count=models.Count('pk')).values('count')), 0
+            ),
+        )
+
+    def for_detail(self):
+        """Orders with their items, and each item's product and variation, in two queries."""
+        return self.select_related('customer').prefetch_related(
+            models.Prefetch(
+                'items', queryset=OrderItem.objects.select_related('product', 'variation__product'),
+            )
+        )
+
+
 class Order(models.Model):
     """
     Order model for customer purchases.
@@ -26,12 +46,14 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = OrderQuerySet.as_manager()
+    
     class Meta:
         db_table = 'orders'
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['customer', 'status']),
-            models.Index(fields=['created_at']),
+            models.Index(fields=['created_at', 'id']),
         ]
     
     def __str__(self):
@@ -85,3 +107,23 @@ class OrderItem(models.Model):
             else:
                 self.price_at_purchase = self.product.price
         super().save(*args, **kwargs)
+
+
+class IdempotencyKey(models.Model):
+    """
+    Stored outcome of an order request sent with an Idempotency-Key header
+    (see orders/idempotency.py). ``status_code`` is null while the first
+    request with the key is still running.
+    """
+    key = models.CharField(max_length=300, primary_key=True)
+    fingerprint = models.CharField(max_length=32)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField()
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        db_table = 'idempotency_keys'
+
+    def __str__(self):
+        return self.key
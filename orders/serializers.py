@@ -1,7 +1,14 @@
-from django.db import transaction
+import uuid
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.utils import timezone
 from rest_framework import serializers
 from .models import Order, OrderItem
-from products.models import Product, ProductVariation
+from products import stock
+from products.models import Product, ProductVariation, StockHold
 
 
 class OrderItemSerializer(serializers.ModelSerializer):
@@ -29,57 +36,173 @@ class OrderCreateItemSerializer(serializers.Serializer):
     price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
 
 
+def resolve_items(items_data):
+    """
+    Products and variations named by ``items_data``, one query each, as
+    ``in_bulk`` dicts. Unknown variations are left out; unknown products
+    are a validation error.
+    """
+    products = Product.objects.in_bulk({item['product_id'] for item in items_data})
+    variations = ProductVariation.objects.select_related('product').in_bulk(
+        {item['variation_id'] for item in items_data if item.get('variation_id')}
+    )
+    missing = {str(item['product_id']) for item in items_data if item['product_id'] not in products}
+    if missing:
+        raise serializers.ValidationError(f"Product not found: {', '.join(sorted(missing))}")
+    return products, variations
+
+
 class OrderCreateSerializer(serializers.ModelSerializer):
     """Serializer for creating orders."""
     items = OrderCreateItemSerializer(many=True, write_only=True)
+    reservation = serializers.UUIDField(required=False, allow_null=True, write_only=True)
     
     class Meta:
         model = Order
-        fields = ('id', 'shipping_address', 'items', 'total_amount', 'customer_name', 'customer_email', 'customer_phone')
+        fields = ('id', 'shipping_address', 'items', 'reservation', 'total_amount', 'customer_name', 'customer_email', 'customer_phone')
         read_only_fields = ('total_amount', 'id')
     
+    @transaction.atomic
     def create(self, validated_data):
+        """
+        Create the order with a fixed number of statements, whatever the
+        size of the cart: products and variations are loaded with one query
+        each, stock is taken with one conditional UPDATE per table (see
+        products/stock.py) and the items are inserted with one INSERT.
+        With a ``reservation``, the stock held for it is what the order
+        takes, and its holds are released.
+        """
         items_data = validated_data.pop('items')
-        order = Order.objects.create(**validated_data)
-        
+        reservation = validated_data.pop('reservation', None)
+        products, variations = resolve_items(items_data)
+
+        items = []
+        variation_quantities = Counter()
+        product_quantities = Counter()
         for item_data in items_data:
-            product = Product.objects.get(id=item_data['product_id'])
-            variation = None
-            if item_data.get('variation_id'):
-                try:
-                    variation = ProductVariation.objects.get(id=item_data['variation_id'])
-                except ProductVariation.DoesNotExist:
-                    pass
-            
+            product = products[item_data['product_id']]
+            variation = variations.get(item_data.get('variation_id'))
             quantity = item_data['quantity']
-            
-            # Check stock
-            if variation:
-                if variation.stock_quantity < quantity:
-                    raise serializers.ValidationError(f"Not enough stock for {variation}")
-            elif product.stock_quantity < quantity:
-                raise serializers.ValidationError(f"Not enough stock for {product.name}")
-            
-            OrderItem.objects.create(
-                order=order,
+            items.append(OrderItem(
                 product=product,
                 variation=variation,
                 quantity=quantity,
                 price_at_purchase=item_data.get('price') or (variation.final_price if variation else product.price)
-            )
-            
-            # Update stock
+            ))
             if variation:
-                variation.stock_quantity -= quantity
-                variation.save()
+                variation_quantities[variation.pk] += quantity
             else:
-                product.stock_quantity -= quantity
-                product.save()
-        
-        order.calculate_total()
+                product_quantities[product.pk] += quantity
+
+        # Over the HTTP transport each statement commits on its own, so a
+        # failed second take() puts back what the first one took.
+        short = [variations[pk] for pk in stock.take(ProductVariation, variation_quantities, reservation)]
+        if not short:
+            short = [products[pk].name for pk in stock.take(Product, product_quantities, reservation)]
+            if short:
+                stock.give(ProductVariation, variation_quantities)
+        if short:
+            raise serializers.ValidationError([f"Not enough stock for {name}" for name in short])
+
+        order = None
+        try:
+            order = Order.objects.create(
+                total_amount=sum(item.subtotal for item in items), **validated_data
+            )
+            for item in items:
+                item.order = order
+            OrderItem.objects.bulk_create(items)
+        except Exception:
+            # Without transactions the takes above have already committed.
+            if not connections[router.db_for_write(Order)].features.supports_transactions:
+                if order is not None:
+                    order.delete()
+                stock.give(ProductVariation, variation_quantities)
+                stock.give(Product, product_quantities)
+            raise
+        if reservation:
+            stock.release(reservation)
+
+        stock.stock_changed(
+            {v.product_id for v in variations.values()} | set(product_quantities)
+        )
         return order
 
 
+class ReservationItemSerializer(serializers.Serializer):
+    """Serializer for the items of a stock reservation."""
+    product_id = serializers.UUIDField()
+    variation_id = serializers.UUIDField(required=False, allow_null=True)
+    quantity = serializers.IntegerField(min_value=1)
+
+
+class ReservationSerializer(serializers.Serializer):
+    """
+    Stock held for a cart. Created from the cart's items, represented from
+    the list of its StockHold rows.
+    """
+    items = ReservationItemSerializer(many=True)
+
+    def validate_items(self, items):
+        if not items:
+            raise serializers.ValidationError("A reservation needs at least one item.")
+        lines = Counter()
+        for item in items:
+            lines[item['product_id'], item.get('variation_id')] += item['quantity']
+        if max(lines.values()) > settings.RESERVATION_MAX_LINE_QUANTITY:
+            raise serializers.ValidationError(
+                f"At most {settings.RESERVATION_MAX_LINE_QUANTITY} of each item can be reserved."
+            )
+        if sum(lines.values()) > settings.RESERVATION_MAX_QUANTITY:
+            raise serializers.ValidationError(
+                f"At most {settings.RESERVATION_MAX_QUANTITY} items can be reserved at once."
+            )
+        return items
+
+    def create(self, validated_data):
+        items_data = validated_data['items']
+        products, variations = resolve_items(items_data)
+        lines = Counter()
+        for item_data in items_data:
+            variation = variations.get(item_data.get('variation_id'))
+            if variation:
+                lines[variation.product_id, variation.pk] += item_data['quantity']
+            else:
+                lines[item_data['product_id'], None] += item_data['quantity']
+
+        reservation = uuid.uuid4()
+        expires_at = timezone.now() + timedelta(seconds=settings.STOCK_HOLD_TTL)
+        short = stock.hold(reservation, lines, expires_at)
+        if short:
+            raise serializers.ValidationError([
+                f"Not enough stock for {variations[variation_id] if variation_id else products[product_id].name}"
+                for product_id, variation_id in short
+            ])
+        return [
+            StockHold(
+                reservation=reservation, product_id=product_id, variation_id=variation_id,
+                quantity=quantity, expires_at=expires_at,
+            )
+            for (product_id, variation_id), quantity in lines.items()
+        ]
+
+    def to_representation(self, holds):
+        return {
+            'id': str(holds[0].reservation),
+            'expires_at': serializers.DateTimeField().to_representation(
+                min(hold.expires_at for hold in holds)
+            ),
+            'items': [
+                {
+                    'product_id': str(hold.product_id),
+                    'variation_id': str(hold.variation_id) if hold.variation_id else None,
+                    'quantity': hold.quantity,
+                }
+                for hold in holds
+            ],
+        }
+
+
 class OrderSerializer(serializers.ModelSerializer):
     """Detailed serializer for order view."""
     items = OrderItemSerializer(many=True, read_only=True)
@@ -97,9 +220,9 @@ class OrderSerializer(serializers.ModelSerializer):
 
 
 class OrderListSerializer(serializers.ModelSerializer):
-    """Lightweight serializer for order list view."""
+    """Lightweight serializer for order list view; expects ``Order.objects.for_list()``."""
     customer_email = serializers.SerializerMethodField()
-    item_count = serializers.SerializerMethodField()
+    item_count = serializers.IntegerField(read_only=True)
     
     class Meta:
         model = Order
@@ -109,9 +232,6 @@ class OrderListSerializer(serializers.ModelSerializer):
         if obj.customer:
             return obj.customer.email
         return obj.customer_email
-    
-    def get_item_count(self, obj):
-        return obj.items.count()
 
 
 class OrderAdminUpdateSerializer(serializers.ModelSerializer):
@@ -136,13 +256,13 @@ class OrderAdminUpdateSerializer(serializers.ModelSerializer):
                 for item in instance.items.select_related('product', 'variation').all():
                     if item.variation:
                         item.variation.stock_quantity += item.quantity
-                        item.variation.save()
+                        item.variation.save(update_fields=['stock_quantity', 'updated_at'])
                         # Remove relation to allow variation deletion
                         item.variation = None
                         item.save()
                     else:
                         item.product.stock_quantity += item.quantity
-                        item.product.save()
+                        item.product.save(update_fields=['stock_quantity', 'updated_at'])
             
             return super().update(instance, validated_data)
 
@@ -0,0 +1,177 @@
+from datetime import timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework.throttling import ScopedRateThrottle
+
+from products import stock
+from products.models import Category, Product, ProductVariation, StockHold
+
+from . import idempotency
+from .models import IdempotencyKey, Order, OrderItem
+
+
+class OrderTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        category = Category.objects.create(name='Shirts', slug='shirts')
+        self.product = Product.objects.create(
+            category=category, name='Shirt', slug='shirt', price=Decimal('10.00'),
+        )
+        self.variation = ProductVariation.objects.create(
+            product=self.product, sku='SHIRT-M', name='M', attributes={'Size': 'M'}, stock_quantity=100,
+        )
+
+    def item(self, quantity, variation=None):
+        variation = variation or self.variation
+        return {'product_id': str(variation.product_id), 'variation_id': str(variation.pk), 'quantity': quantity}
+
+
+class OrderCreateTests(OrderTestCase):
+    url = '/api/v1/orders/'
+
+    def order(self, *items, **data):
+        return self.client.post(
+            self.url, {'shipping_address': '1 Main St', 'items': list(items), **data}, format='json',
+        )
+
+    def test_stock_is_given_back_when_the_order_cannot_be_saved(self):
+        with mock.patch.object(connection.features, 'supports_transactions', False), \
+                mock.patch.object(OrderItem.objects, 'bulk_create', side_effect=DatabaseError), \
+                mock.patch('orders.serializers.stock.give', wraps=stock.give) as give:
+            with self.assertRaises(DatabaseError):
+                self.order(self.item(3))
+
+        give.assert_any_call(ProductVariation, {self.variation.pk: 3})
+        self.variation.refresh_from_db()
+        self.assertEqual(self.variation.stock_quantity, 100)
+        self.assertFalse(Order.objects.exists())
+
+
+class IdempotencyKeyTests(OrderTestCase):
+    url = '/api/v1/orders/'
+
+    def body(self, quantity):
+        return {'shipping_address': '1 Main St', 'items': [self.item(quantity)]}
+
+    def order(self, quantity, key='order-1'):
+        return self.client.post(self.url, self.body(quantity), format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def claim(self, quantity, key='order-1', expires_in=60):
+        now = timezone.now()
+        request = SimpleNamespace(method='POST', path=self.url, data=self.body(quantity))
+        IdempotencyKey.objects.create(
+            key=f'anonymous:{key}', fingerprint=idempotency.fingerprint(request),
+            created_at=now, expires_at=now + timedelta(seconds=expires_in),
+        )
+
+    def test_retry_replays_the_first_response(self):
+        first = self.order(3)
+        retry = self.order(3)
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.data['id'], first.data['id'])
+        self.assertEqual(Order.objects.count(), 1)
+        self.variation.refresh_from_db()
+        self.assertEqual(self.variation.stock_quantity, 97)
+
+    def test_key_reused_for_another_body_is_rejected(self):
+        self.assertEqual(self.order(3).status_code, 201)
+        self.assertEqual(self.order(4).status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_keys_are_scoped_to_the_user(self):
+        self.assertEqual(self.order(3).status_code, 201)
+        user = get_user_model().objects.create_user(username='ada', email='ada@example.com', password='x')
+        self.client.force_authenticate(user)
+        response = self.order(3)
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(response.has_header('Idempotent-Replayed'))
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_failed_request_releases_its_key(self):
+        self.assertEqual(self.order(101).status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+        ProductVariation.objects.filter(pk=self.variation.pk).update(stock_quantity=101)
+        self.assertEqual(self.order(101).status_code, 201)
+
+    @override_settings(IDEMPOTENCY_WAIT_TIMEOUT=0)
+    def test_duplicate_of_a_running_request_gets_409(self):
+        self.claim(3)
+        response = self.order(3)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertFalse(Order.objects.exists())
+
+    def test_claim_left_by_a_dead_worker_is_taken_over(self):
+        self.claim(3, expires_in=-1)
+        self.assertEqual(self.order(3).status_code, 201)
+        self.assertEqual(IdempotencyKey.objects.get().status_code, 201)
+
+
+@override_settings(RESERVATION_MAX_LINE_QUANTITY=100, RESERVATION_MAX_QUANTITY=100)
+class ReservationCheckoutTests(OrderTestCase):
+    def reserve(self, quantity):
+        response = self.client.post('/api/v1/reservations/', {'items': [self.item(quantity)]}, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.data['id']
+
+    def order(self, quantity, reservation=None):
+        data = {'shipping_address': '1 Main St', 'items': [self.item(quantity)]}
+        if reservation:
+            data['reservation'] = reservation
+        return self.client.post('/api/v1/orders/', data, format='json')
+
+    def test_held_stock_goes_to_the_reservation_owner(self):
+        reservation = self.reserve(80)
+        self.assertEqual(self.order(30).status_code, 400)
+        self.assertEqual(self.order(20).status_code, 201)
+
+        self.assertEqual(self.order(80, reservation).status_code, 201)
+        self.variation.refresh_from_db()
+        self.assertEqual(self.variation.stock_quantity, 0)
+        self.assertFalse(StockHold.objects.exists())
+        self.assertEqual(self.client.get(f'/api/v1/reservations/{reservation}/').status_code, 404)
+
+    def test_released_reservation_frees_its_stock(self):
+        reservation = self.reserve(90)
+        self.assertEqual(self.client.delete(f'/api/v1/reservations/{reservation}/').status_code, 204)
+        self.assertEqual(self.order(100).status_code, 201)
+
+
+@override_settings(RESERVATION_MAX_LINE_QUANTITY=5, RESERVATION_MAX_QUANTITY=8)
+class ReservationLimitTests(OrderTestCase):
+    url = '/api/v1/reservations/'
+
+    def test_quantity_per_item_is_capped(self):
+        # Split over two lines, the same variation still counts once.
+        response = self.client.post(self.url, {'items': [self.item(3), self.item(3)]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(StockHold.objects.exists())
+
+    def test_total_quantity_is_capped(self):
+        other = ProductVariation.objects.create(
+            product=self.product, sku='SHIRT-L', name='L', attributes={'Size': 'L'}, stock_quantity=100,
+        )
+        response = self.client.post(self.url, {'items': [self.item(5), self.item(4, other)]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(self.url, {'items': [self.item(5), self.item(3, other)]}, format='json')
+        self.assertEqual(response.status_code, 201)
+
+    def test_creating_reservations_is_throttled(self):
+        with mock.patch.object(ScopedRateThrottle, 'THROTTLE_RATES', {'reservations': '2/hour'}):
+            statuses = [
+                self.client.post(self.url, {'items': [self.item(1)]}, format='json').status_code
+                for _ in range(3)
+            ]
+        self.assertEqual(statuses, [201, 201, 429])
+        self.assertEqual(StockHold.objects.count(), 2)
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import AdminOrderViewSet, CustomerOrderViewSet
+from .views import AdminOrderViewSet, CustomerOrderViewSet, ReservationViewSet
 
 router = DefaultRouter()
 
@@ -9,5 +9,6 @@ router.register(r'admin/orders', AdminOrderViewSet, basename='admin-order')
 
 # Customer routes
 router.register(r'orders', CustomerOrderViewSet, basename='order')
+router.register(r'reservations', ReservationViewSet, basename='reservation')
 
 urlpatterns = router.urls
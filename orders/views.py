@@ -2,18 +2,65 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
+from rest_framework.throttling import ScopedRateThrottle
+from django.http import Http404
+from django.utils import timezone
+from django_filters.rest_framework import DjangoFilterBackend
+from ecommerce_project.pagination import KeysetPagination
+from ecommerce_project import streaming
+from ecommerce_project.streaming import ChunkedStreamingHttpResponse
+from products import stock
+from products.models import StockHold
+from . import export
+from .filters import OrderFilter
+from .idempotency import idempotent
 from .models import Order
-from .serializers import OrderSerializer, OrderCreateSerializer, OrderListSerializer, OrderAdminUpdateSerializer
+from .serializers import OrderSerializer, OrderCreateSerializer, OrderListSerializer, OrderAdminUpdateSerializer, ReservationSerializer
 
 
 class AdminOrderViewSet(viewsets.ModelViewSet):
     """
     Admin viewset for managing all orders.
-    Only accessible by admin users.
+    Only accessible by admin users. The list is cursor paginated, newest first.
+    
+    Endpoints beyond CRUD:
+    - GET /api/v1/admin/orders/export/ - Stream the filtered orders as CSV or NDJSON
+    
+    The list and export take ?created_at_after=, ?created_at_before= and ?status=.
     """
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
     permission_classes = [IsAdminUser]
+    pagination_class = KeysetPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = OrderFilter
+    
+    def get_queryset(self):
+        if self.action == 'list':
+            return self.queryset.for_list()
+        if self.action == 'export':
+            return self.queryset
+        return self.queryset.for_detail()
+    
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Stream the filtered orders, one row per item, oldest first;
+        ?file_format=csv (default) or ndjson.
+        """
+        file_format = request.query_params.get('file_format', streaming.CSV)
+        if file_format not in streaming.FORMATS:
+            return Response(
+                {'file_format': [f'Expected one of: {", ".join(streaming.FORMATS)}.']},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        rows = export.export_rows(self.filter_queryset(self.get_queryset()))
+        response = ChunkedStreamingHttpResponse(
+            streaming.format_rows(rows, file_format, export.COLUMNS),
+            content_type=streaming.CONTENT_TYPES[file_format],
+        )
+        response['Content-Disposition'] = f'attachment; filename="orders.{file_format}"'
+        return response
     
     def get_serializer_class(self):
         if self.action == 'list':
@@ -26,15 +73,20 @@ class AdminOrderViewSet(viewsets.ModelViewSet):
 class CustomerOrderViewSet(viewsets.ModelViewSet):
     """
     Customer viewset for managing their own orders.
+    Order creation honours an Idempotency-Key header, so retried requests
+    place the order only once.
     """
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
         """Return only current user's orders."""
-        if self.request.user.is_authenticated:
-            return Order.objects.filter(customer=self.request.user).select_related('customer').prefetch_related('items__product')
-        return Order.objects.none()
+        if not self.request.user.is_authenticated:
+            return Order.objects.none()
+        orders = Order.objects.filter(customer=self.request.user)
+        if self.action == 'list':
+            return orders.for_list()
+        return orders.for_detail()
     
     def get_permissions(self):
         """Allow anyone to create orders, but only authenticated users to list/retrieve."""
@@ -57,6 +109,7 @@ class CustomerOrderViewSet(viewsets.ModelViewSet):
         else:
             serializer.save(customer=None)
             
+    @idempotent
     def create(self, request, *args, **kwargs):
         """Create order and return detailed response."""
         serializer = self.get_serializer(data=request.data)
@@ -68,5 +121,52 @@ class CustomerOrderViewSet(viewsets.ModelViewSet):
             order = serializer.save(customer=None)
         
         # Return full order details
-        response_serializer = OrderSerializer(order)
+        response_serializer = OrderSerializer(Order.objects.for_detail().get(pk=order.pk))
         return Response(response_serializer.data, status=status.HTTP_201_CREATED)
+
+
+class ReservationViewSet(viewsets.ViewSet):
+    """
+    Stock held for a cart ahead of checkout, until it expires.
+
+    Endpoints:
+    - POST /api/v1/reservations/ - hold stock for a list of items
+    - GET /api/v1/reservations/{id}/ - the items still held
+    - DELETE /api/v1/reservations/{id}/ - release them
+
+    Placing an order with ``"reservation": id`` takes the held stock and
+    releases the reservation. The id is the only credential, as carts are
+    anonymous. So that no client can lock up a product's stock, creating
+    reservations is throttled per client (``reservations`` in
+    DEFAULT_THROTTLE_RATES) and each one is capped at
+    RESERVATION_MAX_LINE_QUANTITY per item and RESERVATION_MAX_QUANTITY in
+    total.
+    """
+    permission_classes = [AllowAny]
+    throttle_scope = 'reservations'
+    lookup_value_regex = '[0-9a-f-]{32,36}'
+
+    def get_throttles(self):
+        if self.action == 'create':
+            return [ScopedRateThrottle()]
+        return []
+
+    def get_holds(self, pk):
+        holds = list(StockHold.objects.filter(reservation=pk, expires_at__gt=timezone.now()))
+        if not holds:
+            raise Http404
+        return holds
+
+    def create(self, request):
+        serializer = ReservationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def retrieve(self, request, pk=None):
+        return Response(ReservationSerializer(self.get_holds(pk)).data)
+
+    def destroy(self, request, pk=None):
+        self.get_holds(pk)
+        stock.release(pk)
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,337 @@
+"""
+Bulk import and export of variations, with their products and images.
+
+One row per variation, keyed by SKU, in CSV or NDJSON:
+
+    product_slug, product_name, category, price, description, product_image_url,
+    sku, name, attributes, price_adjustment, stock_quantity, is_active, images
+
+In CSV, ``attributes`` is a JSON object and ``images`` a ``|``-separated
+list of URLs (the first is the primary image); in NDJSON they are an object
+and a list. Only ``sku`` is required. A new SKU also needs ``product_slug``
+and ``name``, and a new product needs ``product_name``, ``category`` (an
+existing category slug) and ``price``. For existing rows only the columns
+present are updated, so ``sku,stock_quantity`` is a stock update. Giving
+``images`` replaces the variation's images.
+
+Every row is validated before anything is written, and any error rejects
+the whole file. The writes are a handful of batched statements per
+IMPORT_BATCH_SIZE rows, instead of a save() and its signals per row; the
+derived data that products/signals.py maintains is refreshed once at the end.
+"""
+import csv
+import json
+from collections import defaultdict
+
+from django.db import connections, transaction
+from rest_framework import serializers
+
+from core.response_cache import response_cache
+from ecommerce_project import streaming
+from ecommerce_project.streaming import CSV, FORMATS, NDJSON
+
+from . import search
+from .models import Category, Product, ProductVariation, VariationAttribute, VariationImage
+
+COLUMNS = (
+    'product_slug', 'product_name', 'category', 'price', 'description', 'product_image_url',
+    'sku', 'name', 'attributes', 'price_adjustment', 'stock_quantity', 'is_active', 'images',
+)
+# Row column -> model field, for the columns copied as they are.
+PRODUCT_FIELDS = {
+    'product_name': 'name', 'price': 'price', 'description': 'description',
+    'product_image_url': 'image_url',
+}
+VARIATION_FIELDS = ('name', 'attributes', 'price_adjustment', 'stock_quantity', 'is_active')
+IMAGE_SEPARATOR = '|'
+IMPORT_BATCH_SIZE = 500
+
+
+class VariationRowSerializer(serializers.Serializer):
+    """One import row; every column is optional here, see ``import_rows``."""
+
+    product_slug = serializers.SlugField(max_length=50)
+    product_name = serializers.CharField(max_length=255)
+    category = serializers.SlugField(max_length=100)
+    price = serializers.DecimalField(max_digits=10, decimal_places=2)
+    description = serializers.CharField(allow_blank=True)
+    product_image_url = serializers.URLField(allow_blank=True)
+    sku = serializers.CharField(max_length=100)
+    name = serializers.CharField(max_length=200)
+    attributes = serializers.DictField()
+    price_adjustment = serializers.DecimalField(max_digits=10, decimal_places=2)
+    stock_quantity = serializers.IntegerField()
+    is_active = serializers.BooleanField()
+    images = serializers.ListField(child=serializers.URLField())
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for name, field in self.fields.items():
+            field.required = name == 'sku'
+
+    def validate_price(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("Price must be greater than zero.")
+        return value
+
+    def validate_stock_quantity(self, value):
+        if value < 0:
+            raise serializers.ValidationError("Stock quantity cannot be negative.")
+        return value
+
+
+def read_rows(stream, file_format):
+    """Rows of a text ``stream`` as dicts, with empty CSV cells left out."""
+    if file_format == CSV:
+        for row in csv.DictReader(stream):
+            row = {key: value for key, value in row.items() if key and value not in (None, '')}
+            if 'attributes' in row:
+                try:
+                    row['attributes'] = json.loads(row['attributes'])
+                except ValueError:
+                    pass  # Reported by the serializer as "not a dict"
+            if 'images' in row:
+                row['images'] = [url.strip() for url in row['images'].split(IMAGE_SEPARATOR) if url.strip()]
+            yield row
+    elif file_format == NDJSON:
+        for line in stream:
+            if line.strip():
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    yield {'__error__': f"Invalid JSON: {e}"}
+                    continue
+                if isinstance(row, dict):
+                    row = {key: value for key, value in row.items() if value is not None}
+                yield row
+    else:
+        raise ValueError(f"Unknown format {file_format!r}; expected one of {', '.join(FORMATS)}.")
+
+
+def _chunks(items, size=IMPORT_BATCH_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _in_bulk(queryset, field, values):
+    found = {}
+    for chunk in _chunks(values):
+        found.update(queryset.in_bulk(chunk, field_name=field))
+    return found
+
+
+def import_rows(rows, dry_run=False):
+    """
+    Validate and upsert ``rows``. Returns ``{'created': ..., 'updated': ...,
+    'products_created': ..., 'products_updated': ..., 'errors': [...]}``;
+    nothing is written when ``errors`` is not empty or ``dry_run`` is set.
+    Errors are ``{'row': n, 'sku': ..., 'errors': {...}}`` with 1-based rows.
+    """
+    errors = []
+    valid = []
+    # One instance for every row; building a serializer is the slow part.
+    serializer = VariationRowSerializer()
+    for number, row in enumerate(rows, start=1):
+        if not isinstance(row, dict) or '__error__' in row:
+            message = row.get('__error__') if isinstance(row, dict) else "Expected an object."
+            errors.append({'row': number, 'sku': None, 'errors': {'non_field_errors': [message]}})
+            continue
+        try:
+            valid.append((number, serializer.run_validation(row)))
+        except serializers.ValidationError as e:
+            errors.append({'row': number, 'sku': row.get('sku'), 'errors': e.detail})
+
+    # Everything the rows refer to, one IN query per batch.
+    variations = _in_bulk(
+        ProductVariation.objects.all(), 'sku', {data['sku'] for _, data in valid},
+    )
+    products = _in_bulk(
+        Product.objects.all(), 'slug', {data['product_slug'] for _, data in valid if 'product_slug' in data},
+    )
+    categories = _in_bulk(
+        Category.objects.all(), 'slug', {data['category'] for _, data in valid if 'category' in data},
+    )
+
+    seen_skus = set()
+    new_products = {}
+    updated_products = set()
+    for number, data in valid:
+        row_errors = {}
+        sku = data['sku']
+        if sku in seen_skus:
+            row_errors['sku'] = ["Duplicate SKU in this file."]
+        seen_skus.add(sku)
+        if 'category' in data and data['category'] not in categories:
+            row_errors['category'] = [f"Unknown category {data['category']!r}."]
+        if sku not in variations:
+            for column in ('product_slug', 'name'):
+                if column not in data:
+                    row_errors[column] = ["Required for a new SKU."]
+        slug = data.get('product_slug')
+        if slug and slug not in products and slug not in new_products:
+            missing = [column for column in ('product_name', 'category', 'price') if column not in data]
+            for column in missing:
+                row_errors[column] = ["Required for a new product."]
+            if not missing:
+                new_products[slug] = number
+        elif slug in products and any(column in data for column in (*PRODUCT_FIELDS, 'category')):
+            updated_products.add(slug)
+        if row_errors:
+            errors.append({'row': number, 'sku': sku, 'errors': row_errors})
+
+    result = {
+        'created': sum(1 for _, data in valid if data['sku'] not in variations),
+        'updated': sum(1 for _, data in valid if data['sku'] in variations),
+        'products_created': len(new_products),
+        'products_updated': len(updated_products),
+        'errors': sorted(errors, key=lambda error: error['row']),
+    }
+    if errors or dry_run:
+        return result
+
+    with transaction.atomic():
+        _write(valid, variations, products, categories, new_products)
+    return result
+
+
+def _upsert(model, objs, fields):
+    """
+    INSERT ... ON CONFLICT (id) DO UPDATE SET the fields each object was
+    given, in batches. ``fields`` maps each object's pk to its field names.
+    Objects given the same fields share a statement, so a column that a row
+    left out is never written back from the value loaded before the import.
+    """
+    groups = defaultdict(list)
+    for obj in objs:
+        groups[frozenset(fields[obj.pk])].append(obj)
+    for group_fields, group in groups.items():
+        model.objects.bulk_create(
+            group, batch_size=IMPORT_BATCH_SIZE,
+            update_conflicts=True, unique_fields=['id'], update_fields=sorted(group_fields),
+        )
+
+
+def _write(valid, variations, products, categories, new_products):
+    # Products: create the new ones, then apply the product columns of each row.
+    for slug in new_products:
+        products[slug] = Product(slug=slug)
+
+    product_fields = {}
+    upserted_products = {}
+    for _, data in valid:
+        product = products.get(data.get('product_slug'))
+        if product is None:
+            continue
+        fields = product_fields.setdefault(product.pk, {'updated_at'})
+        for column, field in PRODUCT_FIELDS.items():
+            if column in data:
+                setattr(product, field, data[column])
+                fields.add(field)
+        if 'category' in data:
+            product.category = categories[data['category']]
+            fields.add('category')
+        if product._state.adding or len(fields) > 1:
+            upserted_products[product.pk] = product
+
+    for product in upserted_products.values():
+        if product._state.adding:
+            # As Product.save() does for a product without variations.
+            product.total_stock = product.stock_quantity
+            product.in_stock = product.stock_quantity > 0
+            product.min_final_price = product.max_final_price = product.price
+    _upsert(Product, list(upserted_products.values()), product_fields)
+
+    # Variations: same again, keyed by SKU.
+    touched_products = set(upserted_products)
+    upserted = []
+    variation_fields = {}
+    images = {}
+    for _, data in valid:
+        variation = variations.get(data['sku'])
+        if variation is None:
+            variation = ProductVariation(sku=data['sku'])
+        else:
+            # Also refresh the product it moves away from.
+            touched_products.add(variation.product_id)
+        fields = variation_fields[variation.pk] = {'updated_at'}
+        if 'product_slug' in data:
+            variation.product = products[data['product_slug']]
+            fields.add('product')
+        for field in VARIATION_FIELDS:
+            if field in data:
+                setattr(variation, field, data[field])
+                fields.add(field)
+        touched_products.add(variation.product_id)
+        upserted.append(variation)
+        if 'images' in data:
+            images[variation.pk] = data['images']
+    _upsert(ProductVariation, upserted, variation_fields)
+
+    # Images given in the file replace the variation's current ones. A raw
+    # DELETE, as Django would otherwise load each image to send its signals.
+    connection = connections[VariationImage.objects.db]
+    column = VariationImage._meta.get_field('variation').column
+    for chunk in _chunks(images):
+        ids = [ProductVariation._meta.pk.get_db_prep_value(pk, connection) for pk in chunk]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {VariationImage._meta.db_table} "
+                f"WHERE {column} IN ({', '.join(['%s'] * len(ids))})",
+                ids,
+            )
+    VariationImage.objects.bulk_create(
+        [
+            VariationImage(variation_id=pk, image_url=url, is_primary=order == 0, display_order=order)
+            for pk, urls in images.items()
+            for order, url in enumerate(urls)
+        ],
+        batch_size=IMPORT_BATCH_SIZE,
+    )
+
+    # What products/signals.py would have done for each save().
+    for chunk in _chunks(v.pk for v in upserted):
+        VariationAttribute.objects.filter(variation__in=chunk).delete()
+    VariationAttribute.objects.bulk_create(
+        [row for variation in upserted for row in VariationAttribute.rows_for(variation)],
+        batch_size=IMPORT_BATCH_SIZE,
+    )
+    for chunk in _chunks(touched_products):
+        Product.objects.filter(pk__in=chunk).refresh_stock_summary()
+        search.index_products(chunk)
+    response_cache.invalidate('products')
+
+
+def export_rows(queryset=None):
+    """Import rows for ``queryset`` (all variations by default), read in chunks."""
+    if queryset is None:
+        queryset = ProductVariation.objects.all()
+    queryset = queryset.select_related('product__category').prefetch_related('images').order_by(
+        'product__slug', 'sku',
+    )
+    for variation in queryset.iterator(chunk_size=IMPORT_BATCH_SIZE):
+        product = variation.product
+        yield {
+            'product_slug': product.slug,
+            'product_name': product.name,
+            'category': product.category.slug,
+            'price': str(product.price),
+            'description': product.description,
+            'product_image_url': product.image_url or '',
+            'sku': variation.sku,
+            'name': variation.name,
+            'attributes': variation.attributes or {},
+            'price_adjustment': str(variation.price_adjustment),
+            'stock_quantity': variation.stock_quantity,
+            'is_active': variation.is_active,
+            'images': [image.image_url for image in variation.images.all()],
+        }
+
+
+def _csv_row(row):
+    return dict(row, attributes=json.dumps(row['attributes']), images=IMAGE_SEPARATOR.join(row['images']))
+
+
+def format_rows(rows, file_format):
+    """Serialize export rows as lines of ``file_format``, header first for CSV."""
+    return streaming.format_rows(rows, file_format, COLUMNS, csv_row=_csv_row)
@@ -0,0 +1,91 @@
+from django.db import connections
+from django.db.models import Count
+from rest_framework import filters
+
+from . import search
+from .models import ProductVariation, VariationAttribute
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """
+    SearchFilter backed by the FTS5 product index, best matches first.
+
+    Every word of ``?search=`` matches as a prefix, which also serves
+    typeahead. Where FTS5 is not available this is a plain SearchFilter.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        query = search.match_query(' '.join(self.get_search_terms(request)))
+        if not query:
+            return queryset
+        if not search.is_supported(connections[queryset.db]):
+            return super().filter_queryset(request, queryset, view)
+        return search.search(queryset, query)
+
+
+class RelevanceOrderingFilter(filters.OrderingFilter):
+    """OrderingFilter that keeps the search ranking unless ?ordering= is given."""
+
+    def ranked(self, request, queryset):
+        return 'search_rank' in queryset.query.annotations and self.ordering_param not in request.query_params
+
+    def get_ordering(self, request, queryset, view):
+        if self.ranked(request, queryset):
+            return ['search_rank']
+        return super().get_ordering(request, queryset, view)
+
+    def filter_queryset(self, request, queryset, view):
+        if self.ranked(request, queryset):
+            return queryset
+        return super().filter_queryset(request, queryset, view)
+
+
+class AttributeFilter(filters.BaseFilterBackend):
+    """
+    Filter by variation attributes: ``?attr.Color=Red&attr.Size=L``.
+
+    Products match when one of their active variations has every requested
+    attribute; repeating a key (``attr.Color=Red&attr.Color=Blue``) accepts
+    any of its values. Variation querysets are filtered the same way. Each
+    condition is a lookup on the VariationAttribute index.
+    """
+
+    prefix = 'attr.'
+
+    def get_conditions(self, request):
+        conditions = {}
+        for param, values in request.query_params.lists():
+            if param.startswith(self.prefix) and len(param) > len(self.prefix):
+                key = VariationAttribute.normalize_key(param[len(self.prefix):])
+                conditions.setdefault(key, set()).update(v.strip() for v in values if v.strip())
+        return {key: values for key, values in conditions.items() if values}
+
+    def filter_queryset(self, request, queryset, view):
+        conditions = self.get_conditions(request)
+        if not conditions:
+            return queryset
+        variations = ProductVariation.objects.filter(is_active=True)
+        for key, values in conditions.items():
+            variations = variations.filter(pk__in=VariationAttribute.objects.filter(
+                key=key, value__in=values,
+            ).values('variation_id'))
+        if queryset.model is ProductVariation:
+            return queryset.filter(pk__in=variations.values('pk'))
+        return queryset.filter(pk__in=variations.values('product_id'))
+
+
+def attribute_facets(products):
+    """
+    ``{key: [{'value': ..., 'count': ...}, ...]}`` with the number of
+    ``products`` offering each attribute value, most common first.
+    """
+    rows = (
+        VariationAttribute.objects.filter(product__in=products.values('pk'))
+        .values('key', 'value')
+        .annotate(count=Count('product', distinct=True))
+        .order_by('key', '-count', 'value')
+    )
+    facets = {}
+    for row in rows:
+        facets.setdefault(row['key'], []).append({'value': row['value'], 'count': row['count']})
+    return facets
@@ -0,0 +1,31 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from ecommerce_project import streaming
+from products import bulk
+
+
+class Command(BaseCommand):
+    help = "Export variations, with their products and images, in the import format."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', '-o',
+            help="File to write; standard output by default.",
+        )
+        parser.add_argument(
+            '--format', choices=streaming.FORMATS, dest='file_format',
+            help="File format; guessed from --output, csv by default.",
+        )
+
+    def handle(self, *args, **options):
+        path = options['output']
+        file_format = options['file_format'] or streaming.format_for(path) or streaming.CSV
+        stream = open(path, 'w', encoding='utf-8', newline='') if path else sys.stdout
+        try:
+            for part in bulk.format_rows(bulk.export_rows(), file_format):
+                stream.write(part)
+        finally:
+            if path:
+                stream.close()
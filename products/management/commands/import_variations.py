@@ -0,0 +1,38 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ecommerce_project import streaming
+from products import bulk
+
+
+class Command(BaseCommand):
+    help = "Upsert variations, their products and images by SKU from a CSV or NDJSON file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import (see products/bulk.py for the columns).")
+        parser.add_argument(
+            '--format', choices=streaming.FORMATS, dest='file_format',
+            help="File format; guessed from the extension by default.",
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Only validate the file.",
+        )
+
+    def handle(self, *args, **options):
+        file_format = options['file_format'] or streaming.format_for(options['path'])
+        if file_format is None:
+            raise CommandError("Cannot tell the format from the file name; pass --format.")
+        with open(options['path'], encoding='utf-8-sig', newline='') as stream:
+            result = bulk.import_rows(bulk.read_rows(stream, file_format), dry_run=options['dry_run'])
+
+        for error in result['errors']:
+            self.stderr.write(f"Row {error['row']} ({error['sku']}): {json.dumps(error['errors'])}")
+        if result['errors']:
+            raise CommandError(f"{len(result['errors'])} invalid rows; nothing was imported.")
+        verb = "Would import" if options['dry_run'] else "Imported"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {result['created']} new and {result['updated']} existing variations; "
+            f"{result['products_created']} new and {result['products_updated']} updated products."
+        ))
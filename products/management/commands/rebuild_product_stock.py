@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from core.response_cache import response_cache
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized stock and price columns of every product."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--product', action='append', dest='products', metavar='ID',
+            help="Only rebuild this product (can be given more than once).",
+        )
+
+    def handle(self, *args, **options):
+        products = Product.objects.all()
+        if options['products']:
+            products = products.filter(pk__in=options['products'])
+        count = products.refresh_stock_summary()
+        response_cache.invalidate('products')
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt stock summary for {count} products."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from products import stock
+
+
+class Command(BaseCommand):
+    help = "Delete expired stock holds."
+
+    def handle(self, *args, **options):
+        count = stock.sweep()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {count} expired stock holds."))
@@ -0,0 +1,91 @@
+# Generated by Django 4.2.10 on 2026-10-17 14:53
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_stock_summary(apps, schema_editor):
+    # Frozen copy of products.models.stock_summary as of this migration.
+    Product = apps.get_model('products', 'Product')
+    ProductVariation = apps.get_model('products', 'ProductVariation')
+    active = ProductVariation.objects.filter(product=models.OuterRef('pk'), is_active=True)
+
+    def aggregate(expression):
+        return models.Subquery(
+            active.order_by().values('product').annotate(value=expression).values('value')
+        )
+
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    Product.objects.update(
+        total_stock=Coalesce(aggregate(models.Sum('stock_quantity')), models.F('stock_quantity')),
+        active_variation_count=Coalesce(aggregate(models.Count('pk')), 0),
+        min_final_price=models.ExpressionWrapper(
+            models.F('price') + Coalesce(aggregate(models.Min('price_adjustment')), 0),
+            output_field=price,
+        ),
+        max_final_price=models.ExpressionWrapper(
+            models.F('price') + Coalesce(aggregate(models.Max('price_adjustment')), 0),
+            output_field=price,
+        ),
+        in_stock=models.Case(
+            models.When(
+                models.Exists(active),
+                then=models.Exists(active.filter(stock_quantity__gt=0)),
+            ),
+            default=models.ExpressionWrapper(
+                models.Q(stock_quantity__gt=0), output_field=models.BooleanField()
+            ),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='active_variation_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='in_stock',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='max_final_price',
+            field=models.DecimalField(decimal_places=2, editable=False, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='min_final_price',
+            field=models.DecimalField(decimal_places=2, editable=False, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='total_stock',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_active', 'in_stock'], name='products_is_acti_4bb996_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['total_stock'], name='products_total_s_2358d7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['min_final_price'], name='products_min_fin_132255_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['max_final_price'], name='products_max_fin_c4300d_idx'),
+        ),
+        migrations.RunPython(backfill_stock_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+from django.db import migrations
+
+# Frozen copy of the products.search index as of this migration.
+CREATE_SQL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS product_search USING fts5("
+    "product_id UNINDEXED, name, description, category, variations, attributes, "
+    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+)
+
+DOCUMENTS_SQL = """
+    INSERT INTO product_search (product_id, name, description, category, variations, attributes)
+    SELECT p.id, p.name, p.description, c.name,
+        (SELECT group_concat(v.name, ' ') FROM product_variations v
+         WHERE v.product_id = p.id AND v.is_active),
+        (SELECT group_concat(a.value, ' ') FROM product_variations v, json_each(v.attributes) a
+         WHERE v.product_id = p.id AND v.is_active AND json_valid(v.attributes))
+    FROM products p INNER JOIN categories c ON c.id = p.category_id
+"""
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(CREATE_SQL)
+    schema_editor.execute("DELETE FROM product_search")
+    schema_editor.execute(DOCUMENTS_SQL)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS product_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_product_stock_summary'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
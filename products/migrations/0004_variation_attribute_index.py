@@ -0,0 +1,70 @@
+# Generated by Django 4.2.10 on 2026-10-17 14:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+import products.models
+
+
+def backfill_attributes(apps, schema_editor):
+    ProductVariation = apps.get_model('products', 'ProductVariation')
+    VariationAttribute = apps.get_model('products', 'VariationAttribute')
+    rows = []
+    for variation in ProductVariation.objects.filter(is_active=True).iterator():
+        if not isinstance(variation.attributes, dict):
+            continue
+        for key, value in variation.attributes.items():
+            if value in (None, '') or isinstance(value, (dict, list)):
+                continue
+            rows.append(VariationAttribute(
+                product_id=variation.product_id, variation_id=variation.pk,
+                key=str(key).strip().lower()[:100], value=str(value).strip()[:255],
+            ))
+    VariationAttribute.objects.bulk_create(rows, batch_size=500)
+
+
+def configure_search_rank(apps, schema_editor):
+    # Sets the weighted bm25 behind ProductSearch.rank on existing indexes;
+    # frozen copy of products.search.RANK_SQL as of this migration.
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(
+            "INSERT INTO product_search (product_search, rank) "
+            "VALUES ('rank', 'bm25(0, 10.0, 1.0, 4.0, 5.0, 3.0)')"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_product_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSearch',
+            fields=[
+                ('product', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_document', serialize=False, to='products.product')),
+                ('document', products.models.FullTextField(db_column='product_search')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'product_search',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='VariationAttribute',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100)),
+                ('value', models.CharField(max_length=255)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attribute_index', to='products.product')),
+                ('variation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attribute_index', to='products.productvariation')),
+            ],
+            options={
+                'db_table': 'variation_attributes',
+                'indexes': [models.Index(fields=['key', 'value', 'variation'], name='variation_a_key_cdbd05_idx'), models.Index(fields=['product', 'key', 'value'], name='variation_a_product_6c5c84_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_attributes, migrations.RunPython.noop),
+        migrations.RunPython(configure_search_rank, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.10 on 2026-10-17 15:40
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_keyset_pagination_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='variationimage',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.10 on 2026-10-17 15:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_variationimage_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockHold',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('reservation', models.UUIDField(db_index=True)),
+                ('quantity', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('expires_at', models.DateTimeField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_holds', to='products.product')),
+                ('variation', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='stock_holds', to='products.productvariation')),
+            ],
+            options={
+                'db_table': 'stock_holds',
+                'indexes': [models.Index(fields=['variation', 'expires_at'], name='stock_holds_variati_b56c12_idx'), models.Index(fields=['product', 'expires_at'], name='stock_holds_product_690b34_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations
+
+# Frozen copy of products.search.KEY_SQL and DOCUMENTS_SQL as of this
+# migration: every document keyed by the first 64 bits of its product's id.
+KEY_SQL = ' | '.join(
+    f"((instr('0123456789abcdef', substr(p.id, {i + 1}, 1)) - 1) << {60 - 4 * i})"
+    for i in range(16)
+)
+
+DOCUMENTS_SQL = f"""
+    INSERT INTO product_search (rowid, product_id, name, description, category, variations, attributes)
+    SELECT {KEY_SQL}, p.id, p.name, p.description, c.name,
+        (SELECT group_concat(v.name, ' ') FROM product_variations v
+         WHERE v.product_id = p.id AND v.is_active),
+        (SELECT group_concat(a.value, ' ') FROM product_variations v, json_each(v.attributes) a
+         WHERE v.product_id = p.id AND v.is_active AND json_valid(v.attributes))
+    FROM products p INNER JOIN categories c ON c.id = p.category_id
+"""
+
+
+def key_search_documents(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("DELETE FROM product_search")
+    schema_editor.execute(DOCUMENTS_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_stock_hold'),
+    ]
+
+    operations = [
+        migrations.RunPython(key_search_documents, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,7 @@
 import uuid
 from django.db import models
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from django.utils.text import slugify
 
 
@@ -29,10 +31,63 @@ class Category(models.Model):
         super().save(*args, **kwargs)
 
 
+class ProductQuerySet(models.QuerySet):
+    def refresh_stock_summary(self):
+        """
+        Recompute the denormalized stock and price columns of these products
+        from their active variations, in a single UPDATE. updated_at moves
+        too, since it backs the products' Last-Modified and ETag.
+        """
+        return self.update(updated_at=timezone.now(), **stock_summary(ProductVariation))
+
+
+def stock_summary(variation_model):
+    """
+    Expressions for Product's denormalized columns, as correlated subqueries
+    over the active variations of each product. A product without active
+    variations falls back to its own stock_quantity and price.
+    """
+    active = variation_model.objects.filter(product=models.OuterRef('pk'), is_active=True)
+
+    def aggregate(expression):
+        return models.Subquery(
+            active.order_by().values('product').annotate(value=expression).values('value')
+        )
+
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    return {
+        'total_stock': Coalesce(
+            aggregate(models.Sum('stock_quantity')), models.F('stock_quantity')
+        ),
+        'active_variation_count': Coalesce(aggregate(models.Count('pk')), 0),
+        'min_final_price': models.ExpressionWrapper(
+            models.F('price') + Coalesce(aggregate(models.Min('price_adjustment')), 0),
+            output_field=price,
+        ),
+        'max_final_price': models.ExpressionWrapper(
+            models.F('price') + Coalesce(aggregate(models.Max('price_adjustment')), 0),
+            output_field=price,
+        ),
+        'in_stock': models.Case(
+            models.When(
+                models.Exists(active),
+                then=models.Exists(active.filter(stock_quantity__gt=0)),
+            ),
+            default=models.ExpressionWrapper(
+                models.Q(stock_quantity__gt=0), output_field=models.BooleanField()
+            ),
+        ),
+    }
+
+
 class Product(models.Model):
     """
     Product model representing items for sale.
     Stock is now calculated from variations if they exist.
+
+    total_stock, in_stock, active_variation_count and the final price range
+    are denormalized from the active variations (see products/signals.py)
+    so listing, filtering and sorting on them needs no join.
     """
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='products')
@@ -43,38 +98,37 @@ class Product(models.Model):
     stock_quantity = models.IntegerField(default=0, help_text="Base stock (used only if no variations)")
     image_url = models.URLField(blank=True, null=True)
     is_active = models.BooleanField(default=True)
+    
+    # Denormalized from active variations; rebuild with `manage.py rebuild_product_stock`
+    total_stock = models.IntegerField(default=0, editable=False)
+    in_stock = models.BooleanField(default=False, editable=False)
+    active_variation_count = models.IntegerField(default=0, editable=False)
+    min_final_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, editable=False)
+    max_final_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, editable=False)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = ProductQuerySet.as_manager()
+    
     class Meta:
         db_table = 'products'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['is_active', 'in_stock']),
+            models.Index(fields=['total_stock']),
+            models.Index(fields=['min_final_price']),
+            models.Index(fields=['max_final_price']),
+            models.Index(fields=['created_at', 'id']),
+        ]
     
     def __str__(self):
         return self.name
     
-    @property
-    def in_stock(self):
-        """
-        Check if product is in stock.
-        If has variations, check variation stock. Otherwise check base stock.
-        """
-        if self.variations.filter(is_active=True).exists():
-            return self.variations.filter(is_active=True, stock_quantity__gt=0).exists()
-        return self.stock_quantity > 0
-    
-    @property
-    def total_stock(self):
-        """
-        Calculate total stock from all active variations.
-        If no variations, return base stock.
-        """
-        active_variations = self.variations.filter(is_active=True)
-        if active_variations.exists():
-            from django.db.models import Sum
-            total = active_variations.aggregate(total=Sum('stock_quantity'))['total']
-            return total or 0
-        return self.stock_quantity
+    def refresh_stock_summary(self):
+        """Recompute the denormalized columns and reload them on this instance."""
+        Product.objects.filter(pk=self.pk).refresh_stock_summary()
+        self.refresh_from_db(fields=STOCK_SUMMARY_FIELDS)
     
     def save(self, *args, **kwargs):
         """Auto-generate slug if not provided."""
@@ -86,9 +140,21 @@ class Product(models.Model):
                 slug = f"{base_slug}-{counter}"
                 counter += 1
             self.slug = slug
+        if self._state.adding:
+            # A new product has no variations yet.
+            self.total_stock = self.stock_quantity
+            self.in_stock = self.stock_quantity > 0
+            self.min_final_price = self.max_final_price = self.price
         super().save(*args, **kwargs)
 
 
+STOCK_SUMMARY_FIELDS = (
+    'total_stock', 'in_stock', 'active_variation_count', 'min_final_price', 'max_final_price',
+)
+# Product columns the summary is derived from, besides the variations.
+STOCK_SUMMARY_SOURCES = {'price', 'stock_quantity'}
+
+
 
 
 class ProductVariation(models.Model):
@@ -133,11 +199,19 @@ class ProductVariation(models.Model):
         indexes = [
             models.Index(fields=['product', 'is_active']),
             models.Index(fields=['sku']),
+            models.Index(fields=['created_at', 'id']),
         ]
     
     def __str__(self):
         return f"{self.product.name} - {self.name}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the product, so moving the variation refreshes both summaries.
+        instance._loaded_product_id = instance.__dict__.get('product_id')
+        return instance
+    
     @property
     def display_name(self):
         """Get the display name for this variation."""
@@ -171,6 +245,108 @@ class ProductVariation(models.Model):
 
 
 
+class VariationAttribute(models.Model):
+    """
+    One attribute of an active variation, copied out of
+    ProductVariation.attributes so filters and facet counts can use an index.
+    Keys are stored lower-cased, since attributes use both "Color" and "color".
+    Maintained by products/signals.py.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='attribute_index')
+    variation = models.ForeignKey(ProductVariation, on_delete=models.CASCADE, related_name='attribute_index')
+    key = models.CharField(max_length=100)
+    value = models.CharField(max_length=255)
+    
+    class Meta:
+        db_table = 'variation_attributes'
+        indexes = [
+            models.Index(fields=['key', 'value', 'variation']),
+            models.Index(fields=['product', 'key', 'value']),
+        ]
+    
+    def __str__(self):
+        return f"{self.key}={self.value}"
+    
+    @staticmethod
+    def normalize_key(key):
+        return str(key).strip().lower()
+    
+    @classmethod
+    def rows_for(cls, variation):
+        """Index rows for ``variation``; none unless it is active."""
+        if not variation.is_active or not isinstance(variation.attributes, dict):
+            return []
+        return [
+            cls(
+                product_id=variation.product_id, variation=variation,
+                key=cls.normalize_key(key)[:100], value=str(value).strip()[:255],
+            )
+            for key, value in variation.attributes.items()
+            # Nested values are not filterable
+            if value not in (None, '') and not isinstance(value, (dict, list))
+        ]
+
+
+class StockHold(models.Model):
+    """
+    A quantity of a variation, or of a product without one, held for a cart
+    until ``expires_at``. The holds of one cart share a ``reservation`` id.
+    Active holds count against available stock (see products/stock.py);
+    expired ones simply stop counting.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    reservation = models.UUIDField(db_index=True)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_holds')
+    variation = models.ForeignKey(
+        ProductVariation, on_delete=models.CASCADE, null=True, blank=True, related_name='stock_holds',
+    )
+    quantity = models.PositiveIntegerField()
+    created_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'stock_holds'
+        indexes = [
+            models.Index(fields=['variation', 'expires_at']),
+            models.Index(fields=['product', 'expires_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity}x {self.variation or self.product} until {self.expires_at}"
+
+
+class FullTextField(models.TextField):
+    """The hidden column of an FTS5 table that is named after the table."""
+
+
+@FullTextField.register_lookup
+class Match(models.Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', lhs_params + rhs_params
+
+
+class ProductSearch(models.Model):
+    """
+    The FTS5 product search index, mapped so queries can join it like any
+    other relation. The table itself is created by products/search.py.
+    """
+    product = models.OneToOneField(
+        Product, primary_key=True, on_delete=models.DO_NOTHING,
+        db_constraint=False, related_name='search_document',
+    )
+    document = FullTextField(db_column='product_search')
+    # Weighted bm25 of the current MATCH; lower is better.
+    rank = models.FloatField()
+    
+    class Meta:
+        managed = False
+        db_table = 'product_search'
+
+
 class VariationImage(models.Model):
     """
     Images for product variations.
@@ -182,6 +358,7 @@ class VariationImage(models.Model):
     is_primary = models.BooleanField(default=False)
     display_order = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         db_table = 'variation_images'
@@ -200,5 +377,5 @@ class VariationImage(models.Model):
             VariationImage.objects.filter(
                 variation=self.variation,
                 is_primary=True
-            ).exclude(id=self.id).update(is_primary=False)
+            ).exclude(id=self.id).update(is_primary=False, updated_at=timezone.now())
         super().save(*args, **kwargs)
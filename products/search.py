@@ -0,0 +1,122 @@
+"""
+Full-text product search on an SQLite FTS5 index (Turso supports FTS5).
+
+``product_search`` holds one document per product: its name, description
+and category name, plus the names and attribute values of its active
+variations. Signals refresh a product's document whenever it, its category
+or one of its variations changes (see products/signals.py), and
+``manage.py rebuild_search_index`` rebuilds the whole index.
+
+``product_id`` is UNINDEXED, as FTS5 columns cannot be looked up without a
+full scan. A document is found by its rowid instead: the first 64 bits of
+the product's UUID, which both Python (``document_key()``) and SQL
+(``KEY_SQL``) derive from the id.
+"""
+import re
+import struct
+
+from django.db import connections, transaction
+from django.db.models import F
+
+from .models import Product
+
+TABLE = 'product_search'
+
+CREATE_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+    "product_id UNINDEXED, name, description, category, variations, attributes, "
+    # Prefix indexes keep short typeahead queries ("sh*", "shi*") fast.
+    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+)
+
+# Rowid of the document of the product in ``{column}``, a UUID stored as
+# 32 hex digits: its first 16 digits as a signed 64-bit integer.
+KEY_SQL = ' | '.join(
+    f"((instr('0123456789abcdef', substr({{column}}, {i + 1}, 1)) - 1) << {60 - 4 * i})"
+    for i in range(16)
+)
+
+# One document per product, built entirely in SQL.
+DOCUMENTS_SQL = f"""
+    INSERT INTO {TABLE} (rowid, product_id, name, description, category, variations, attributes)
+    SELECT {KEY_SQL.format(column='p.id')}, p.id, p.name, p.description, c.name,
+        (SELECT group_concat(v.name, ' ') FROM product_variations v
+         WHERE v.product_id = p.id AND v.is_active),
+        (SELECT group_concat(a.value, ' ') FROM product_variations v, json_each(v.attributes) a
+         WHERE v.product_id = p.id AND v.is_active AND json_valid(v.attributes))
+    FROM products p INNER JOIN categories c ON c.id = p.category_id
+"""
+
+# bm25() weights behind the hidden rank column, in column order: a hit in
+# the name counts most.
+RANK_SQL = f"INSERT INTO {TABLE} ({TABLE}, rank) VALUES ('rank', 'bm25(0, 10.0, 1.0, 4.0, 5.0, 3.0)')"
+
+_TERM = re.compile(r'\w+')
+
+
+def is_supported(connection):
+    return connection.vendor == 'sqlite'
+
+
+def match_query(text):
+    """
+    FTS5 query matching every word of ``text`` as a prefix, so "blu sh"
+    finds "Blue Shirt". Quoting each term keeps user input from being read
+    as FTS5 syntax.
+    """
+    return ' '.join(f'"{term}"*' for term in _TERM.findall(text))
+
+
+def search(queryset, query):
+    """Restrict ``queryset`` to products matching ``query``, best match first."""
+    return queryset.filter(search_document__document__match=query).annotate(
+        search_rank=F('search_document__rank'),
+    ).order_by('search_rank')
+
+
+def document_key(product_id):
+    """Rowid of the document of ``product_id``; matches ``KEY_SQL``."""
+    return struct.unpack('>q', Product._meta.pk.to_python(product_id).bytes[:8])[0]
+
+
+def _db_ids(product_ids, connection):
+    pk = Product._meta.pk
+    return [pk.get_db_prep_value(product_id, connection) for product_id in product_ids]
+
+
+def _delete_documents(cursor, product_ids):
+    keys = [document_key(product_id) for product_id in product_ids]
+    placeholders = ', '.join(['%s'] * len(keys))
+    cursor.execute(f"DELETE FROM {TABLE} WHERE rowid IN ({placeholders})", keys)
+
+
+def index_products(product_ids, using='default'):
+    """Rewrite the documents of ``product_ids``."""
+    connection = connections[using]
+    if not product_ids or not is_supported(connection):
+        return
+    ids = _db_ids(product_ids, connection)
+    placeholders = ', '.join(['%s'] * len(ids))
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        _delete_documents(cursor, product_ids)
+        cursor.execute(f"{DOCUMENTS_SQL} WHERE p.id IN ({placeholders})", ids)
+
+
+def remove_products(product_ids, using='default'):
+    connection = connections[using]
+    if not product_ids or not is_supported(connection):
+        return
+    with connection.cursor() as cursor:
+        _delete_documents(cursor, product_ids)
+
+
+def rebuild_index(using='default'):
+    """Create the index if needed and rewrite every document."""
+    connection = connections[using]
+    if not is_supported(connection):
+        return
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        cursor.execute(CREATE_SQL)
+        cursor.execute(RANK_SQL)
+        cursor.execute(f"DELETE FROM {TABLE}")
+        cursor.execute(DOCUMENTS_SQL)
@@ -26,7 +26,7 @@ class VariationImageSerializer(serializers.ModelSerializer):
         read_only_fields = ('id', 'created_at')
 
 
-from core.models import Color
+from core.colors import color_hex
 
 class ProductVariationSerializer(serializers.ModelSerializer):
     """Serializer for ProductVariation model with dynamic attributes."""
@@ -52,15 +52,8 @@ class ProductVariationSerializer(serializers.ModelSerializer):
         attributes = obj.attributes or {}
         # Check for 'Color' or 'color' key
         color_name = attributes.get('Color') or attributes.get('color')
-        
-        if color_name:
-            try:
-                color_obj = Color.objects.filter(name__iexact=color_name).first()
-                if color_obj:
-                    return color_obj.hex_code
-            except Exception:
-                pass
-        return None
+        # Served from memory; see core/colors.py
+        return color_hex(color_name)
     
     def validate_stock_quantity(self, value):
         """Ensure stock quantity is not negative."""
@@ -139,10 +132,8 @@ class ProductSerializer(serializers.ModelSerializer):
     
     category_name = serializers.CharField(source='category.name', read_only=True)
     category_slug = serializers.CharField(source='category.slug', read_only=True)
-    in_stock = serializers.BooleanField(read_only=True)
     variations = ProductVariationSerializer(many=True, read_only=True)
-    variation_count = serializers.SerializerMethodField()
-    total_stock = serializers.IntegerField(read_only=True)
+    variation_count = serializers.IntegerField(source='active_variation_count', read_only=True)
     
     class Meta:
         model = Product
@@ -151,13 +142,13 @@ class ProductSerializer(serializers.ModelSerializer):
             'name', 'slug', 'description', 'price', 
             'stock_quantity', 'total_stock', 'in_stock', 'image_url', 
             'is_active', 'variations', 'variation_count',
+            'min_final_price', 'max_final_price',
             'created_at', 'updated_at'
         )
-        read_only_fields = ('id', 'slug', 'created_at', 'updated_at', 'stock_quantity')
-    
-    def get_variation_count(self, obj):
-        """Get count of active variations."""
-        return obj.variations.filter(is_active=True).count()
+        read_only_fields = (
+            'id', 'slug', 'created_at', 'updated_at', 'stock_quantity',
+            'total_stock', 'in_stock', 'min_final_price', 'max_final_price',
+        )
     
     def validate_price(self, value):
         """Ensure price is positive."""
@@ -170,22 +161,18 @@ class ProductListSerializer(serializers.ModelSerializer):
     """Lightweight serializer for product list view."""
     
     category_name = serializers.CharField(source='category.name', read_only=True)
-    in_stock = serializers.BooleanField(read_only=True)
     has_variations = serializers.SerializerMethodField()
-    variation_count = serializers.SerializerMethodField()
+    variation_count = serializers.IntegerField(source='active_variation_count', read_only=True)
     
     class Meta:
         model = Product
         fields = (
             'id', 'category_name', 'name', 'slug', 'price', 
+            'min_final_price', 'max_final_price',
             'in_stock', 'image_url', 'has_variations', 
             'variation_count', 'created_at'
         )
     
-    def get_has_variations(self, obj):
+    def get_has_variations(self, obj) -> bool:
         """Check if product has variations."""
-        return obj.variations.filter(is_active=True).exists()
-    
-    def get_variation_count(self, obj):
-        """Get count of active variations."""
-        return obj.variations.filter(is_active=True).count()
+        return obj.active_variation_count > 0
@@ -0,0 +1,106 @@
+"""
+Keep data derived from products in step with the products themselves:
+
+- Product's denormalized stock and price columns. Every path that changes
+  stock (the admin API, orders, order cancellation) saves a ProductVariation
+  or Product, so it passes through here. Bulk updates that bypass save()
+  must call ``Product.objects.filter(...).refresh_stock_summary()`` and
+  ``response_cache.invalidate('products')``.
+- The full-text search index (see products/search.py).
+- The VariationAttribute index behind attribute filters and facets.
+- Cached catalog responses (see core/response_cache.py).
+
+Fixtures (``loaddata``) are saved raw and skipped: their rows may arrive
+before the rows they refer to, and they carry the derived columns and
+VariationAttribute rows already. Run ``rebuild_search_index`` afterwards.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.response_cache import response_cache
+
+from . import search
+from .models import (
+    STOCK_SUMMARY_SOURCES, Category, Product, ProductVariation, VariationAttribute, VariationImage,
+)
+
+# Fields that appear in a product's search document.
+PRODUCT_SEARCH_SOURCES = {'name', 'description', 'category'}
+VARIATION_SEARCH_SOURCES = {'name', 'attributes', 'is_active', 'product'}
+
+
+@receiver(post_save, sender=ProductVariation)
+@receiver(post_delete, sender=ProductVariation)
+def refresh_product(sender, instance, origin=None, update_fields=None, **kwargs):
+    if kwargs.get('raw'):
+        return
+    if isinstance(origin, Product) or getattr(origin, 'model', None) is Product:
+        # Cascade from deleting the product itself.
+        return
+    product_ids = {instance.product_id, getattr(instance, '_loaded_product_id', None)}
+    product_ids.discard(None)
+    Product.objects.filter(pk__in=product_ids).refresh_stock_summary()
+    if update_fields is None or VARIATION_SEARCH_SOURCES.intersection(update_fields):
+        search.index_products(product_ids)
+        if kwargs['signal'] is post_save:
+            # Deleting the variation cascades to its rows.
+            VariationAttribute.objects.filter(variation=instance).delete()
+            VariationAttribute.objects.bulk_create(VariationAttribute.rows_for(instance))
+    instance._loaded_product_id = instance.product_id
+
+
+@receiver(post_save, sender=Product)
+def refresh_own_stock(sender, instance, created, update_fields=None, **kwargs):
+    if kwargs.get('raw'):
+        return
+    if created:
+        # Product.save() filled in the summary of a product without variations.
+        return
+    if update_fields is not None and not STOCK_SUMMARY_SOURCES.intersection(update_fields):
+        return
+    instance.refresh_stock_summary()
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, created, update_fields=None, **kwargs):
+    if kwargs.get('raw'):
+        return
+    if created or update_fields is None or PRODUCT_SEARCH_SOURCES.intersection(update_fields):
+        search.index_products([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    if kwargs.get('raw'):
+        return
+    search.remove_products([instance.pk])
+
+
+@receiver(post_save, sender=Category)
+def reindex_category(sender, instance, created, **kwargs):
+    if kwargs.get('raw'):
+        return
+    if not created:
+        # The category name is part of each product's document.
+        search.index_products(list(instance.products.values_list('pk', flat=True)))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductVariation)
+@receiver(post_delete, sender=ProductVariation)
+@receiver(post_save, sender=VariationImage)
+@receiver(post_delete, sender=VariationImage)
+def invalidate_product_responses(sender, **kwargs):
+    if kwargs.get('raw'):
+        return
+    response_cache.invalidate('products')
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_responses(sender, **kwargs):
+    if kwargs.get('raw'):
+        return
+    # Products embed their category.
+    response_cache.invalidate('categories', 'products')
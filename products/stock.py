@@ -0,0 +1,193 @@
+"""
+Set-based stock updates.
+
+``take()`` removes the quantities of a whole cart from ``stock_quantity`` in
+a single conditional UPDATE, all or nothing:
+
+    UPDATE product_variations
+    SET stock_quantity = stock_quantity - CASE id WHEN ... END
+    WHERE id IN (...) AND NOT EXISTS (
+        SELECT 1 FROM product_variations
+        WHERE id IN (...) AND stock_quantity < CASE id WHEN ... END
+    )
+
+The check and the decrement are one statement, so concurrent checkouts can
+never oversell, and no row changes unless every row has enough. These
+updates bypass save(): call ``stock_changed()`` afterwards to refresh what
+products/signals.py would have.
+
+Carts can hold stock ahead of checkout with ``hold()``. A hold is a
+StockHold row, not a change to ``stock_quantity``: the quantity available
+to sell is the stock minus the active holds on it, and a hold that runs
+past ``expires_at`` stops counting without anything being written. Placing
+a hold inserts rows only, with the same all-or-nothing availability check
+in one statement, so carts competing for a hot variation never update its
+row until they check out. An order placed for a reservation takes its
+stock with that reservation's own holds left out of the check, then
+``release()`` deletes them. ``manage.py sweep_stock_holds`` clears expired
+rows.
+"""
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, router
+from django.db.models import Case, Exists, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from core.response_cache import response_cache
+
+from .models import Product, ProductVariation, StockHold
+
+_PRODUCTS = Product._meta.db_table
+_VARIATIONS = ProductVariation._meta.db_table
+_HOLDS = StockHold._meta.db_table
+
+# Available quantity of each line of a cart: stock minus active holds of
+# the same variation, or of the same product for lines without one.
+# Missing rows have nothing available.
+AVAILABLE_SQL = f"""
+    WITH lines (n, id, product_id, variation_id, quantity) AS (VALUES {{values}}),
+    available AS (
+        SELECT lines.*, COALESCE(CASE WHEN lines.variation_id IS NULL
+            THEN (SELECT stock_quantity FROM {_PRODUCTS} WHERE id = lines.product_id)
+            ELSE (SELECT stock_quantity FROM {_VARIATIONS} WHERE id = lines.variation_id)
+        END, 0) - (
+            SELECT COALESCE(SUM(h.quantity), 0) FROM {_HOLDS} h
+            WHERE h.variation_id IS lines.variation_id
+            AND (lines.variation_id IS NOT NULL OR h.product_id = lines.product_id)
+            AND h.expires_at > %s
+        ) AS available
+        FROM lines
+    )
+"""
+
+HOLD_SQL = AVAILABLE_SQL + f"""
+    INSERT INTO {_HOLDS} (id, reservation, product_id, variation_id, quantity, created_at, expires_at)
+    SELECT id, %s, product_id, variation_id, quantity, %s, %s FROM available
+    WHERE NOT EXISTS (SELECT 1 FROM available WHERE quantity > available)
+    RETURNING id
+"""
+
+SHORT_SQL = AVAILABLE_SQL + "SELECT n FROM available WHERE quantity > available ORDER BY n"
+
+
+def _per_row(quantities):
+    return Case(
+        *(When(pk=pk, then=Value(quantity)) for pk, quantity in quantities.items()),
+        output_field=IntegerField(),
+    )
+
+
+def held(model, reservation=None):
+    """
+    Quantity of each ``model`` row (Product or ProductVariation) held by
+    active holds, leaving out those of ``reservation``.
+    """
+    holds = StockHold.objects.filter(expires_at__gt=timezone.now())
+    if model is ProductVariation:
+        holds = holds.filter(variation=OuterRef('pk'))
+    else:
+        holds = holds.filter(product=OuterRef('pk'), variation__isnull=True)
+    if reservation is not None:
+        holds = holds.exclude(reservation=reservation)
+    group = 'variation' if model is ProductVariation else 'product'
+    return Coalesce(
+        Subquery(holds.order_by().values(group).annotate(total=Sum('quantity')).values('total')), 0
+    )
+
+
+def take(model, quantities, reservation=None):
+    """
+    Take ``{pk: quantity}`` out of the stock of ``model`` rows (Product or
+    ProductVariation), leaving what other carts hold. The holds of
+    ``reservation`` are the caller's own and do not count. Returns the pks
+    that are missing or short; nothing is taken unless that list is empty.
+    """
+    if not quantities:
+        return []
+    needed = _per_row(quantities)
+    rows = model.objects.filter(pk__in=list(quantities))
+    short = rows.filter(stock_quantity__lt=needed + held(model, reservation))
+    taken = rows.filter(~Exists(short)).update(
+        stock_quantity=F('stock_quantity') - needed, updated_at=timezone.now(),
+    )
+    if taken == len(quantities):
+        return []
+    if taken:
+        # Some rows no longer exist; put back what was taken from the others.
+        give(model, quantities)
+    available = set(rows.exclude(pk__in=short.values('pk')).values_list('pk', flat=True))
+    return [pk for pk in quantities if pk not in available]
+
+
+def give(model, quantities):
+    """Put ``{pk: quantity}`` back into the stock of ``model`` rows."""
+    if quantities:
+        model.objects.filter(pk__in=list(quantities)).update(
+            stock_quantity=F('stock_quantity') + _per_row(quantities), updated_at=timezone.now(),
+        )
+
+
+def stock_changed(product_ids):
+    """Refresh the stock summaries and cached responses of ``product_ids``."""
+    Product.objects.filter(pk__in=list(product_ids)).refresh_stock_summary()
+    response_cache.invalidate('products')
+
+
+def _lines_sql(sql, lines, connection):
+    """``sql`` with a VALUES row per line, and the parameters of those rows."""
+    prep = StockHold._meta.pk.get_db_prep_value
+    params = []
+    for n, ((product_id, variation_id), quantity) in enumerate(lines.items()):
+        params += [
+            n, prep(uuid.uuid4(), connection), prep(product_id, connection),
+            prep(variation_id, connection) if variation_id else None, quantity,
+        ]
+    values = ', '.join(['(%s, %s, %s, %s, %s)'] * len(lines))
+    return sql.format(values=values), params
+
+
+def hold(reservation, lines, expires_at=None):
+    """
+    Hold ``{(product_id, variation_id or None): quantity}`` for
+    ``reservation`` until ``expires_at`` (STOCK_HOLD_TTL seconds from now
+    by default).
+    Lines of a variation must name the variation's own product. Returns the
+    keys of the lines that are missing or short; nothing is held unless
+    that list is empty.
+    """
+    if not lines:
+        return []
+    connection = connections[router.db_for_write(StockHold)]
+    field = StockHold._meta.get_field('expires_at')
+    now = timezone.now()
+    if expires_at is None:
+        expires_at = now + timedelta(seconds=settings.STOCK_HOLD_TTL)
+    sql, params = _lines_sql(HOLD_SQL, lines, connection)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params + [
+            field.get_db_prep_value(now, connection),
+            StockHold._meta.get_field('reservation').get_db_prep_value(reservation, connection),
+            field.get_db_prep_value(now, connection),
+            field.get_db_prep_value(expires_at, connection),
+        ])
+        # Counted from RETURNING: drivers report no rowcount for WITH ... INSERT.
+        if len(cursor.fetchall()) == len(lines):
+            return []
+        sql, params = _lines_sql(SHORT_SQL, lines, connection)
+        cursor.execute(sql, params + [field.get_db_prep_value(now, connection)])
+        keys = list(lines)
+        return [keys[n] for n, in cursor.fetchall()]
+
+
+def release(reservation):
+    """Drop the holds of ``reservation``."""
+    StockHold.objects.filter(reservation=reservation).delete()
+
+
+def sweep():
+    """Delete expired holds; they no longer count against stock anyway."""
+    count, _ = StockHold.objects.filter(expires_at__lte=timezone.now()).delete()
+    return count
@@ -0,0 +1,179 @@
+import uuid
+from decimal import Decimal
+from unittest import mock
+
+from django.core import serializers
+from django.core.cache import cache, caches
+from django.db.models import F
+from django.test import TestCase
+
+from core.models import Color
+
+from . import bulk, search, stock
+from .models import Category, Product, ProductVariation
+
+
+class BulkImportTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Shirts', slug='shirts')
+        self.product = Product.objects.create(
+            category=category, name='Shirt', slug='shirt', price=Decimal('10.00'),
+        )
+        for sku in ('A', 'B'):
+            ProductVariation.objects.create(
+                product=self.product, sku=sku, name=sku, attributes={'Size': sku}, stock_quantity=5,
+            )
+
+    def test_rows_only_write_their_own_columns(self):
+        write = bulk._write
+
+        def order_placed_during_import(*args):
+            # Stock taken after the import loaded the variations.
+            ProductVariation.objects.filter(sku='A').update(stock_quantity=F('stock_quantity') - 1)
+            write(*args)
+
+        rows = [
+            {'sku': 'A', 'price_adjustment': '2.50'},
+            {'sku': 'B', 'stock_quantity': 9},
+        ]
+        with mock.patch.object(bulk, '_write', side_effect=order_placed_during_import):
+            result = bulk.import_rows(rows)
+
+        self.assertEqual(result['errors'], [])
+        a = ProductVariation.objects.get(sku='A')
+        b = ProductVariation.objects.get(sku='B')
+        self.assertEqual(a.price_adjustment, Decimal('2.50'))
+        self.assertEqual(a.stock_quantity, 4)
+        self.assertEqual(b.stock_quantity, 9)
+        self.assertEqual(b.price_adjustment, Decimal('0.00'))
+
+
+class ProductConditionalGetTests(TestCase):
+    def setUp(self):
+        self.color = Color.objects.create(name='Red', hex_code='#FF0000')
+        category = Category.objects.create(name='Shirts', slug='shirts')
+        Product.objects.create(category=category, name='Shirt', slug='shirt', price=Decimal('10.00'))
+        self.url = '/api/v1/products/shirt/'
+
+    def test_etag_is_the_same_on_every_worker(self):
+        etag = self.client.get(self.url)['ETag']
+        # Another worker starts with its own, empty local cache.
+        cache.clear()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_etag_changes_with_color_hex_codes(self):
+        etag = self.client.get(self.url)['ETag']
+        self.color.hex_code = '#CC0000'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.color.save()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class StockTakeTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Shirts', slug='shirts')
+        self.product = Product.objects.create(
+            category=category, name='Shirt', slug='shirt', price=Decimal('10.00'), stock_quantity=3,
+        )
+        self.m = ProductVariation.objects.create(
+            product=self.product, sku='M', name='M', attributes={'Size': 'M'}, stock_quantity=5,
+        )
+        self.l = ProductVariation.objects.create(
+            product=self.product, sku='L', name='L', attributes={'Size': 'L'}, stock_quantity=2,
+        )
+
+    def stock_quantities(self):
+        return dict(ProductVariation.objects.values_list('sku', 'stock_quantity'))
+
+    def test_oversell_is_rejected_and_nothing_is_taken(self):
+        short = stock.take(ProductVariation, {self.m.pk: 3, self.l.pk: 3})
+        self.assertEqual(short, [self.l.pk])
+        self.assertEqual(self.stock_quantities(), {'M': 5, 'L': 2})
+
+    def test_the_last_units_can_be_taken_once(self):
+        self.assertEqual(stock.take(ProductVariation, {self.m.pk: 5, self.l.pk: 2}), [])
+        self.assertEqual(self.stock_quantities(), {'M': 0, 'L': 0})
+        self.assertEqual(stock.take(ProductVariation, {self.m.pk: 1}), [self.m.pk])
+        self.assertEqual(self.stock_quantities(), {'M': 0, 'L': 0})
+
+    def test_missing_rows_are_short(self):
+        self.l.delete()
+        short = stock.take(ProductVariation, {self.m.pk: 1, self.l.pk: 1})
+        self.assertEqual(short, [self.l.pk])
+        self.assertEqual(self.stock_quantities(), {'M': 5})
+
+    def test_products_without_variations(self):
+        self.assertEqual(stock.take(Product, {self.product.pk: 4}), [self.product.pk])
+        self.assertEqual(stock.take(Product, {self.product.pk: 3}), [])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 0)
+
+    def test_stock_held_by_other_carts_cannot_be_taken(self):
+        self.assertEqual(stock.hold(uuid.uuid4(), {(self.product.pk, self.m.pk): 4}), [])
+        self.assertEqual(stock.take(ProductVariation, {self.m.pk: 2}), [self.m.pk])
+        self.assertEqual(stock.take(ProductVariation, {self.m.pk: 1}), [])
+        self.assertEqual(self.stock_quantities()['M'], 4)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        caches['responses'].clear()
+        self.category = Category.objects.create(name='Shirts', slug='shirts')
+        # Mostly ties, so the primary key decides the order within a price.
+        for n, price in enumerate(['10.00'] * 5 + ['20.00'] * 2 + ['5.00']):
+            self.create(f'shirt-{n}', price)
+
+    def create(self, slug, price):
+        return Product.objects.create(category=self.category, name=slug, slug=slug, price=Decimal(price))
+
+    def expected(self, ordering):
+        return [str(pk) for pk in Product.objects.order_by(*ordering).values_list('pk', flat=True)]
+
+    def walk(self, url, direction):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([row['id'] for row in response.json()['results']])
+            url = response.json()[direction]
+        return pages
+
+    def test_next_pages_cover_every_row_once(self):
+        for ordering, param in ((('price', 'id'), 'price'), (('-price', '-id'), '-price')):
+            pages = self.walk(f'/api/v1/products/?ordering={param}&page_size=3', 'next')
+            self.assertEqual([len(page) for page in pages], [3, 3, 2])
+            self.assertEqual(sum(pages, []), self.expected(ordering))
+
+    def test_previous_pages_retrace_the_next_ones(self):
+        forward = self.walk('/api/v1/products/?ordering=price&page_size=3', 'next')
+        last = self.client.get('/api/v1/products/?ordering=price&page_size=3')
+        while last.json()['next']:
+            last = self.client.get(last.json()['next'])
+        backward = self.walk(last.json()['previous'], 'previous')
+        self.assertEqual(backward, forward[-2::-1])
+
+    def test_rows_added_before_the_cursor_do_not_shift_later_pages(self):
+        first = self.client.get('/api/v1/products/?ordering=price&page_size=3')
+        rest = self.expected(('price', 'id'))[3:]
+        # A tie at the cheapest price sorts before the cursor.
+        self.create('shirt-new', '5.00')
+        caches['responses'].clear()
+        pages = self.walk(first.json()['next'], 'next')
+        self.assertEqual(sum(pages, []), rest)
+
+
+class FixtureLoadingTests(TestCase):
+    def test_raw_saves_skip_the_derived_data(self):
+        category = Category.objects.create(name='Shirts', slug='shirts')
+        product = Product.objects.create(category=category, name='Shirt', slug='shirt', price=Decimal('10.00'))
+        variation = ProductVariation.objects.create(
+            product=product, sku='M', name='M', attributes={'Size': 'M'}, stock_quantity=5,
+        )
+        # loaddata saves objects in fixture order, here a variation before its product.
+        data = serializers.serialize('json', [variation, product, category])
+        category.delete()
+        with mock.patch.object(search, 'index_products') as index_products:
+            for obj in serializers.deserialize('json', data):
+                obj.save()
+        index_products.assert_not_called()
+        self.assertEqual(ProductVariation.objects.get().stock_quantity, 5)
@@ -5,7 +5,8 @@ from .views import (
     AdminProductViewSet,
     AdminProductVariationViewSet,
     CategoryViewSet,
-    ProductViewSet
+    ProductViewSet,
+    product_stock,
 )
 
 router = DefaultRouter()
@@ -19,4 +20,7 @@ router.register(r'admin/variations', AdminProductVariationViewSet, basename='adm
 router.register(r'categories', CategoryViewSet, basename='category')
 router.register(r'products', ProductViewSet, basename='product')
 
-urlpatterns = router.urls
+urlpatterns = [
+    # Async view; see turso_backend/aio.py
+    path('products/<slug:slug>/stock/', product_stock, name='product-stock'),
+] + router.urls
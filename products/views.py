@@ -1,8 +1,26 @@
+import csv
+import io
+import uuid
+
+from django.db import connections
+from django.db.models import Count, Max
+from django.http import HttpResponseNotAllowed, JsonResponse
+from django.utils import timezone
 from rest_framework import viewsets, filters, permissions, status
 from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Category, Product, ProductVariation, VariationImage
+from core.models import Color
+from core.conditional import ConditionalGetMixin
+from core.response_cache import CachedResponseMixin
+from ecommerce_project.db_router import read_alias
+from ecommerce_project.pagination import KeysetPagination
+from ecommerce_project import streaming
+from ecommerce_project.streaming import ChunkedStreamingHttpResponse
+from . import bulk
+from ecommerce_project.turso_backend.aio import get_async_client
+from .models import Category, Product, ProductVariation, StockHold, VariationImage
 from .serializers import (
     CategorySerializer, 
     ProductSerializer, 
@@ -11,6 +29,9 @@ from .serializers import (
     ProductVariationCreateSerializer,
     VariationImageSerializer
 )
+from .filters import (
+    AttributeFilter, FullTextSearchFilter, RelevanceOrderingFilter, attribute_facets,
+)
 from .permissions import IsAdminUser, IsAdminOrReadOnly
 
 
@@ -45,10 +66,12 @@ class AdminProductViewSet(viewsets.ModelViewSet):
     queryset = Product.objects.select_related('category').prefetch_related('variations__images').all()
     serializer_class = ProductSerializer
     permission_classes = [IsAdminUser]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['category', 'is_active']
+    filter_backends = [
+        DjangoFilterBackend, AttributeFilter, FullTextSearchFilter, RelevanceOrderingFilter,
+    ]
+    filterset_fields = ['category', 'is_active', 'in_stock']
     search_fields = ['name', 'description']
-    ordering_fields = ['name', 'price', 'created_at', 'stock_quantity']
+    ordering_fields = ['name', 'price', 'created_at', 'stock_quantity', 'total_stock']
     ordering = ['-created_at']
     lookup_field = 'id'
 
@@ -58,16 +81,19 @@ class AdminProductVariationViewSet(viewsets.ModelViewSet):
     Admin-only CRUD operations for product variations.
     
     Endpoints:
-    - GET    /api/v1/admin/variations/           - List all variations
+    - GET    /api/v1/admin/variations/           - List variations (cursor paginated)
     - POST   /api/v1/admin/variations/           - Create variation
     - GET    /api/v1/admin/variations/{id}/      - Get variation details
     - PUT    /api/v1/admin/variations/{id}/      - Update variation
     - DELETE /api/v1/admin/variations/{id}/      - Delete variation
+    - POST   /api/v1/admin/variations/import/    - Upsert variations by SKU from a CSV/NDJSON file
+    - GET    /api/v1/admin/variations/export/    - Download variations as CSV/NDJSON
     """
     queryset = ProductVariation.objects.select_related('product').prefetch_related('images').all()
     serializer_class = ProductVariationSerializer
     permission_classes = [IsAdminUser]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    pagination_class = KeysetPagination
+    filter_backends = [DjangoFilterBackend, AttributeFilter, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['product', 'is_active']
     search_fields = ['sku', 'product__name', 'name']
     ordering_fields = ['final_price', 'stock_quantity', 'created_at']
@@ -120,49 +146,209 @@ class AdminProductVariationViewSet(viewsets.ModelViewSet):
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def bulk_import(self, request):
+        """
+        Upsert variations, their products and images from an uploaded
+        ``file`` (.csv, .ndjson or .jsonl; format described in
+        products/bulk.py). With ?dry_run=true the file is only validated.
+        Any invalid row rejects the whole file with per-row errors.
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'file': ['No file was submitted.']}, status=status.HTTP_400_BAD_REQUEST)
+        file_format = streaming.format_for(upload.name)
+        if file_format is None:
+            return Response(
+                {'file': ['Expected a .csv, .ndjson or .jsonl file.']},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        dry_run = request.query_params.get('dry_run', '').lower() in ('1', 'true', 'yes')
+        try:
+            stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig')
+            result = bulk.import_rows(bulk.read_rows(stream, file_format), dry_run=dry_run)
+        except (UnicodeDecodeError, csv.Error) as e:
+            return Response({'file': [f'Could not read the file: {e}']}, status=status.HTTP_400_BAD_REQUEST)
+        if result['errors']:
+            return Response(result, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result)
+    
+    @action(detail=False, methods=['get'], url_path='export')
+    def bulk_export(self, request):
+        """
+        Stream the filtered variations in the import format;
+        ?file_format=csv (default) or ndjson.
+        """
+        file_format = request.query_params.get('file_format', streaming.CSV)
+        if file_format not in streaming.FORMATS:
+            return Response(
+                {'file_format': [f'Expected one of: {", ".join(streaming.FORMATS)}.']},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        rows = bulk.export_rows(self.filter_queryset(self.get_queryset()))
+        response = ChunkedStreamingHttpResponse(
+            bulk.format_rows(rows, file_format), content_type=streaming.CONTENT_TYPES[file_format],
+        )
+        response['Content-Disposition'] = f'attachment; filename="variations.{file_format}"'
+        return response
+    
 
 
 
-class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
+class CategoryViewSet(CachedResponseMixin, ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     """
     Public read-only operations for categories.
     
     Endpoints:
     - GET /api/v1/categories/      - List all categories
     - GET /api/v1/categories/{id}/ - Get category details
+    
+    Responses are served from the response cache (core/response_cache.py)
+    and carry ETag / Last-Modified validators (core/conditional.py).
     """
+    cache_resources = ('categories',)
+    # product_count depends on the category's products.
+    conditional_fields = ('updated_at', 'products__updated_at')
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [permissions.AllowAny]
     lookup_field = 'slug'
 
 
-class ProductViewSet(viewsets.ReadOnlyModelViewSet):
+class ProductViewSet(CachedResponseMixin, ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     """
     Public read-only operations for products.
     
     Endpoints:
-    - GET /api/v1/products/           - List active products
+    - GET /api/v1/products/           - List active products (cursor paginated)
+    - GET /api/v1/products/suggest/   - Typeahead suggestions (?search=)
+    - GET /api/v1/products/facets/    - Attribute value counts for the filtered list
     - GET /api/v1/products/{slug}/    - Get product details (with variations)
     
     Query parameters:
-    - category: Filter by category slug
-    - search: Search in name and description
-    - ordering: Sort by name, price, created_at
+    - category__slug: Filter by category slug
+    - in_stock: Filter by availability (true/false)
+    - max_final_price__gte / min_final_price__lte: Filter by price range
+    - attr.{name}: Filter by variation attribute, e.g. attr.Color=Red&attr.Size=L
+    - search: Full-text search over name, description, category, variation
+      names and attributes; results are ranked by relevance
+    - ordering: Sort by name, price, min_final_price, max_final_price, total_stock, created_at
+    - cursor / page_size: Page through the list (see ecommerce_project/pagination.py)
+    
+    List and detail responses are served from the response cache
+    (core/response_cache.py) and carry ETag / Last-Modified validators
+    (core/conditional.py).
     """
+    cache_resources = ('products',)
+    conditional_fields = ('updated_at', 'category__updated_at')
     queryset = Product.objects.select_related('category').prefetch_related(
         'variations__images'
     ).filter(is_active=True)
     permission_classes = [permissions.AllowAny]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['category__slug']
+    pagination_class = KeysetPagination
+    filter_backends = [
+        DjangoFilterBackend, AttributeFilter, FullTextSearchFilter, RelevanceOrderingFilter,
+    ]
+    filterset_fields = {
+        'category__slug': ['exact'],
+        'in_stock': ['exact'],
+        'min_final_price': ['lte'],
+        'max_final_price': ['gte'],
+    }
     search_fields = ['name', 'description']
-    ordering_fields = ['name', 'price', 'created_at']
+    ordering_fields = ['name', 'price', 'min_final_price', 'max_final_price', 'total_stock', 'created_at']
     ordering = ['-created_at']
     lookup_field = 'slug'
     
+    def get_queryset(self):
+        """The list reads the denormalized stock columns; skip loading variations."""
+        queryset = super().get_queryset()
+        if self.action in ('list', 'suggest', 'facets'):
+            return queryset.prefetch_related(None)
+        return queryset
+    
     def get_serializer_class(self):
         """Use lightweight serializer for list view."""
         if self.action == 'list':
             return ProductListSerializer
         return ProductSerializer
+    
+    def get_conditional_fields(self):
+        """The detail view also renders variations and their images."""
+        if self.action == 'retrieve':
+            return self.conditional_fields + (
+                'variations__updated_at', 'variations__images__updated_at',
+            )
+        return self.conditional_fields
+    
+    def get_conditional_state(self):
+        """Variations carry their color's hex code."""
+        if self.action == 'retrieve':
+            return Color.objects.aggregate(modified_colors=Max('updated_at'), count_colors=Count('pk'))
+        return {}
+    
+    @action(detail=False)
+    def suggest(self, request):
+        """Names and slugs of the best matches for a partly typed ?search=."""
+        queryset = self.filter_queryset(self.get_queryset())
+        if not request.query_params.get(FullTextSearchFilter.search_param):
+            queryset = queryset.none()
+        return Response(list(queryset.values('name', 'slug')[:10]))
+    
+    @action(detail=False)
+    def facets(self, request):
+        """Per-value product counts of each variation attribute in the current result set."""
+        return Response(attribute_facets(self.filter_queryset(self.get_queryset())))
+
+
+async def product_stock(request, slug):
+    """
+    Live stock for one active product, served natively under ASGI.
+
+    Endpoint:
+    - GET /api/v1/products/{slug}/stock/
+
+    Storefronts poll this while a product page is open, so it awaits Turso
+    directly instead of occupying a worker thread per request. The
+    ``available`` quantities leave out what carts currently hold.
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+
+    alias = read_alias('products')
+    client = get_async_client(alias)
+    now = connections[alias].ops.adapt_datetimefield_value(timezone.now())
+    holds = StockHold._meta.db_table
+    rows = await client.fetchall(
+        f"SELECT p.total_stock, p.in_stock, "
+        f"(SELECT COALESCE(SUM(h.quantity), 0) FROM {holds} h "
+        f"WHERE h.product_id = p.id AND h.expires_at > %s) AS held, "
+        f"v.id, v.sku, v.name, v.stock_quantity AS variation_stock, "
+        f"(SELECT COALESCE(SUM(h.quantity), 0) FROM {holds} h "
+        f"WHERE h.variation_id = v.id AND h.expires_at > %s) AS variation_held "
+        f"FROM {Product._meta.db_table} p "
+        f"LEFT JOIN {ProductVariation._meta.db_table} v "
+        f"ON v.product_id = p.id AND v.is_active "
+        f"WHERE p.slug = %s AND p.is_active",
+        [now, now, slug],
+    )
+    if not rows:
+        return JsonResponse({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+    return JsonResponse({
+        'slug': slug,
+        'in_stock': bool(rows[0]['in_stock']),
+        'total_stock': rows[0]['total_stock'],
+        'available': max(rows[0]['total_stock'] - rows[0]['held'], 0),
+        'variations': [
+            {
+                'id': str(uuid.UUID(row['id'])),
+                'sku': row['sku'],
+                'name': row['name'],
+                'stock_quantity': row['variation_stock'],
+                'available': max(row['variation_stock'] - row['variation_held'], 0),
+                'in_stock': row['variation_stock'] > 0,
+            }
+            for row in rows if row['id'] is not None
+        ],
+    })